@@ -0,0 +1,310 @@
+"""Archive of parsed feed entries and LLM summaries with full-text search.
+
+Every entry and summary the feeders produce is stored in SQLite with FTS5
+indexes, so older papers and summaries can be searched by text, source,
+category and date instead of grepping run folders.  The archive is the primary
+record: the feeders' summary Markdown files, and Markdown, PDF and JSON
+exports, are generated from it.  Entries are only ever appended; a summary is
+kept once per source, category and run.
+
+Usage:
+    python archive.py search "diffusion AND segmentation" --source arxiv --since 2025-01-01
+    python archive.py search "inflation" --summaries --category bbc
+    python archive.py search "C++ GPT-4" --literal
+    python archive.py export "graph neural" -o graph_papers.pdf
+    python archive.py stats
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from seen_index import entry_key
+
+DEFAULT_DB = "./archive.sqlite3"
+
+
+def literal_query(text: str) -> str:
+    """FTS5 query matching every whitespace-separated term of *text* as typed (e.g. ``C++``, ``COVID-19``)."""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    key TEXT,
+    source TEXT,
+    category TEXT,
+    title TEXT,
+    authors TEXT,
+    summary TEXT,
+    link TEXT,
+    published TEXT,
+    fields TEXT,
+    archived TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS entries_key ON entries (source, category, key);
+CREATE INDEX IF NOT EXISTS entries_archived ON entries (archived);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    title, authors, summary, content='entries', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, title, authors, summary) VALUES (new.id, new.title, new.authors, new.summary);
+END;
+
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    category TEXT,
+    text TEXT,
+    archived TEXT,
+    run TEXT
+);
+CREATE INDEX IF NOT EXISTS summaries_archived ON summaries (archived);
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+    text, content='summaries', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS summaries_ai AFTER INSERT ON summaries BEGIN
+    INSERT INTO summaries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_au AFTER UPDATE ON summaries BEGIN
+    INSERT INTO summaries_fts (summaries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO summaries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+# Entry fields kept in their own columns; everything else goes into the JSON ``fields`` column
+_SUMMARY_FIELDS = ('summary', 'abstract', 'description')
+_AUTHOR_FIELDS = ('authors', 'author')
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Archive:
+    """SQLite/FTS5 store of entries and summaries."""
+
+    def __init__(self, db_path: str = DEFAULT_DB):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        if 'run' not in {row[1] for row in self._conn.execute("PRAGMA table_info(summaries)")}:
+            # Archives created before summaries were keyed by run
+            self._conn.execute("ALTER TABLE summaries ADD COLUMN run TEXT")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS summaries_run ON summaries (source, category, run)")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_entries(self, entries: Iterable, source: str, category: Optional[str] = None) -> int:
+        """Archive parsed entries (EntryRecord or dict); returns how many were new."""
+        rows, archived = [], _now()
+        for entry in entries:
+            fields = {name: value for name, value in entry.items() if value}
+            summary = next((str(fields[name]) for name in _SUMMARY_FIELDS if name in fields), '')
+            authors = next((str(fields[name]) for name in _AUTHOR_FIELDS if name in fields), '')
+            rows.append((
+                entry_key(entry) or json.dumps(fields, sort_keys=True, ensure_ascii=False),
+                source, category or '', str(fields.get('title', '')), authors, summary,
+                str(fields.get('link', '')), str(fields.get('pub_date') or fields.get('published') or ''),
+                json.dumps(fields, ensure_ascii=False, default=str), archived,
+            ))
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO entries (key, source, category, title, authors, summary, link, published,"
+                " fields, archived) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            return cursor.rowcount
+
+    def add_summary(self, text: str, source: str, category: Optional[str] = None, run: Optional[str] = None) -> int:
+        """Archive one LLM summary and return its id.
+
+        The summary of a *source*, *category* and *run* is stored once: archiving
+        it again (a rerun or resume of the run) replaces the text.  Summaries
+        without a *run* are always added.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO summaries (source, category, run, text, archived) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (source, category, run) DO UPDATE SET text = excluded.text, archived = excluded.archived",
+                (source, category or '', run, text, _now()))
+            summary_id = cursor.lastrowid
+            if run is not None:
+                # lastrowid is not set when the upsert updated an existing row
+                summary_id = self._conn.execute(
+                    "SELECT id FROM summaries WHERE source = ? AND category = ? AND run = ?",
+                    (source, category or '', run)).fetchone()[0]
+            self._conn.commit()
+            return summary_id
+
+    def summary_text(self, summary_id: int) -> Optional[str]:
+        """Text of the archived summary *summary_id*, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM summaries WHERE id = ?", (summary_id,)).fetchone()
+        return row[0] if row else None
+
+    def search(self,
+               query: Optional[str] = None,
+               kind: str = 'entries',
+               source: Optional[str] = None,
+               category: Optional[str] = None,
+               since: Optional[str] = None,
+               until: Optional[str] = None,
+               limit: Optional[int] = 50,
+               literal: bool = False) -> List[Dict]:
+        """Full-text search (FTS5 query syntax) with source, category and date filters.
+
+        *since* and *until* are inclusive ``YYYY-MM-DD`` dates of archiving.
+        Matches are ranked by BM25 and carry a ``snippet``; without *query* the
+        newest rows come first.  With *literal*, every term of *query* is
+        matched as typed instead of being parsed as FTS5 syntax.  An invalid
+        FTS5 query raises :class:`sqlite3.OperationalError`.
+        """
+        if kind not in ('entries', 'summaries'):
+            raise ValueError(f"Unknown archive kind: {kind}")
+        table, fts = kind, f"{kind}_fts"
+        columns = [f"{table}.*"]
+        clauses, params = [], []
+        if query:
+            column = 2 if kind == 'entries' else 0
+            columns.append(f"snippet({fts}, {column}, '[', ']', '…', 16) AS snippet")
+            clauses.append(f"{fts} MATCH ?")
+            params.append(literal_query(query) if literal else query)
+        for column, value in (('source', source), ('category', category)):
+            if value:
+                clauses.append(f"{table}.{column} = ?")
+                params.append(value)
+        if since:
+            clauses.append(f"{table}.archived >= ?")
+            params.append(since)
+        if until:
+            clauses.append(f"{table}.archived < date(?, '+1 day')")
+            params.append(until)
+
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if query:
+            sql += f" JOIN {fts} ON {fts}.rowid = {table}.id"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {f'bm25({fts})' if query else f'{table}.id DESC'}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            result = {}
+            for table in ('entries', 'summaries'):
+                rows = self._conn.execute(
+                    f"SELECT source, COUNT(*), MIN(archived), MAX(archived) FROM {table} GROUP BY source").fetchall()
+                result[table] = {row[0]: {'count': row[1], 'first': row[2], 'last': row[3]} for row in rows}
+            return result
+
+
+def entry_dict(row: Dict) -> Dict:
+    """Turn an archived entry row back into the fetcher's entry fields."""
+    return json.loads(row['fields'])
+
+
+def write_markdown(rows: List[Dict], md_path: str, kind: str = 'entries', title: str = "Archive export"):
+    """Write archived rows as Markdown (entries in the fetcher's raw format)."""
+    if kind == 'entries':
+        from universal_rss_fetcher2 import UniversalRSSFetcher
+        UniversalRSSFetcher().render_entries([entry_dict(row) for row in rows], md_path, title, with_text=False)
+        return
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write(f"# {title} ({len(rows)} summaries)\n\n")
+        for row in rows:
+            heading = ' / '.join(part for part in (row['source'], row['category']) if part)
+            f.write(f"## {heading} ({row['archived']})\n\n{row['text']}\n\n")
+    print(f"✅ Markdown saved: {md_path}")
+
+
+def export(rows: List[Dict], path: str, kind: str = 'entries', title: str = "Archive export"):
+    """Export rows to ``.md``, ``.pdf`` or ``.json`` depending on *path*'s extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=1)
+        print(f"✅ JSON saved: {path}")
+    elif extension == '.md':
+        write_markdown(rows, path, kind, title)
+    elif extension == '.pdf':
+        from pdf_renderer import render_batch
+        md_path = path[:-len(extension)] + '.md'
+        write_markdown(rows, md_path, kind, title)
+        render_batch([(md_path, path)], force=True)
+    else:
+        raise ValueError(f"Unsupported export format: {path}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=DEFAULT_DB, help='archive database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_filters(command):
+        command.add_argument('query', nargs='?', help='FTS5 query, e.g. "graph AND (diffusion OR flow)"')
+        command.add_argument('--literal', action='store_true',
+                             help='match the query words as typed (e.g. C++, GPT-4) instead of FTS5 syntax')
+        command.add_argument('--summaries', action='store_true', help='search LLM summaries instead of entries')
+        command.add_argument('--source', help="source type, e.g. 'arxiv' or 'news'")
+        command.add_argument('--category', help="feed category, e.g. 'cs.LG' or 'bbc'")
+        command.add_argument('--since', help='first archiving date (YYYY-MM-DD)')
+        command.add_argument('--until', help='last archiving date (YYYY-MM-DD)')
+        command.add_argument('--limit', type=int, default=50, help='maximum number of results (0 for all)')
+
+    add_filters(commands.add_parser('search', help='full-text search'))
+    export_parser = commands.add_parser('export', help='export matches to .md, .pdf or .json')
+    add_filters(export_parser)
+    export_parser.add_argument('-o', '--output', required=True, help='output file (.md, .pdf or .json)')
+    commands.add_parser('stats', help='row counts per source')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"[ERROR] Archive not found: {args.db}")
+        sys.exit(1)
+    archive = Archive(args.db)
+    if args.command == 'stats':
+        print(json.dumps(archive.stats(), indent=1, ensure_ascii=False))
+        return
+
+    kind = 'summaries' if args.summaries else 'entries'
+    try:
+        rows = archive.search(args.query, kind, args.source, args.category, args.since, args.until,
+                              args.limit or None, literal=args.literal)
+    except sqlite3.OperationalError as e:
+        print(f"[ERROR] Invalid search query {args.query!r}: {e} (use --literal to match the words as typed)")
+        sys.exit(1)
+    if args.command == 'export':
+        export(rows, args.output, kind, title=args.query or 'Archive export')
+        return
+    for row in rows:
+        label = ' / '.join(part for part in (row['source'], row['category']) if part)
+        if kind == 'entries':
+            print(f"[{row['archived'][:10]}] {label}: {row['title']}")
+            if row['link']:
+                print(f"    {row['link']}")
+        else:
+            run = f" (run {row['run']})" if row.get('run') else ''
+            print(f"[{row['archived'][:10]}] {label} summary #{row['id']}{run}")
+        if row.get('snippet'):
+            print(f"    {row['snippet']}")
+    print(f"{len(rows)} result(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Offline benchmarks for LLM4PaperNews (run with ``python -m benchmarks.<name>``)."""
@@ -0,0 +1,66 @@
+"""Compare html_cleaner.clean_html with the previous BeautifulSoup path.
+
+Usage: python -m benchmarks.bench_html_cleaner [--size N] [--repeat R]
+"""
+import argparse
+import time
+
+import feedparser
+from bs4 import BeautifulSoup
+
+import html_cleaner
+from benchmarks.fixtures import news_feed, wiley_feed
+
+
+def soup_clean(content_html: str) -> str:
+    """The per-entry BeautifulSoup extraction previously used for Wiley abstracts."""
+    soup = BeautifulSoup(content_html, 'html.parser')
+    ps = soup.find_all('p')
+    if ps:
+        return "\n\n".join(p.get_text(strip=True) for p in ps).strip()
+    return soup.get_text(strip=True)
+
+
+def fixture_markup(size: int):
+    wiley = feedparser.parse(wiley_feed(size))
+    news = feedparser.parse(news_feed(size))
+    return {
+        'wiley': [entry.get('content', [{}])[0].get('value', '') for entry in wiley.entries],
+        'news': [entry.get('summary', '') for entry in news.entries],
+    }
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1000, help='entries per fixture feed')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, markups in fixture_markup(args.size).items():
+        def cold():
+            html_cleaner._memo.clear()
+            for markup in markups:
+                html_cleaner.clean_html(markup)
+
+        soup_time = best_of(lambda: [soup_clean(m) for m in markups], args.repeat)
+        cold_time = best_of(cold, args.repeat)
+        warm_time = best_of(lambda: [html_cleaner.clean_html(m) for m in markups], args.repeat)
+        raw_chars = sum(len(m) for m in markups)
+        clean_chars = sum(len(html_cleaner.clean_html(m)) for m in markups)
+        print(f"{name:<6} entries={len(markups):<6} beautifulsoup={soup_time * 1000:8.1f}ms "
+              f"clean_html={cold_time * 1000:8.1f}ms ({soup_time / cold_time:4.1f}x) "
+              f"memoized={warm_time * 1000:6.1f}ms  chars {raw_chars} -> {clean_chars}")
+    print(f"clean_html paths: {html_cleaner.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare feedparser.parse with the streaming parser on large synthetic feeds.
+
+Reports peak traced memory, time to the first entry and total time for every
+fixture source, and checks that both paths produce the same records and
+formatted text.  Exits non-zero when any source differs.
+
+Usage: python -m benchmarks.bench_stream_parser [--size N] [--source pubmed news]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fixtures import FEEDS
+from universal_rss_fetcher2 import UniversalRSSFetcher
+
+
+def measure(path: str, source_type: str, stream: bool):
+    fetcher = UniversalRSSFetcher(stream=stream)
+    tracemalloc.start()
+    start = time.perf_counter()
+    feed = fetcher.fetch_rss(path)
+    config = fetcher.resolve_config(feed, source_type)
+    entries = iter(feed if stream else feed.entries)
+    extract = fetcher.compile_config(config).extract
+    records = [extract(next(entries))]
+    first = time.perf_counter() - start
+    records.extend(extract(entry) for entry in entries)
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return [record.to_dict() for record in records], fetcher.render_entries(records), first, total, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=20000, help='entries in the synthetic feed')
+    parser.add_argument('--source', nargs='+', choices=sorted(FEEDS), default=sorted(FEEDS))
+    args = parser.parse_args()
+
+    errors = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for source in args.source:
+            path = os.path.join(tmp, f'{source}.xml')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(FEEDS[source](args.size))
+            print(f"{source} feed: {args.size} entries, {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+            outputs = {}
+            for stream in (False, True):
+                records, text, first, total, peak = measure(path, source, stream)
+                outputs[stream] = (records, text)
+                label = 'streaming' if stream else 'feedparser'
+                print(f"{label:<10} first entry={first * 1000:9.1f}ms total={total:7.2f}s "
+                      f"peak memory={peak / 2 ** 20:7.1f} MB")
+            identical = outputs[False] == outputs[True]
+            print(f"identical output: {identical}\n")
+            if not identical:
+                index = next((i for i, (a, b) in enumerate(zip(outputs[False][0], outputs[True][0])) if a != b), None)
+                errors.append(f"{source}: streaming output differs from feedparser "
+                              f"({len(outputs[False][0])} vs {len(outputs[True][0])} records, "
+                              f"first differing record: {index})")
+
+    for error in errors:
+        print(f"[ERROR] {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
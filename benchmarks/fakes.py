@@ -0,0 +1,234 @@
+"""Local stand-ins for the network services and tools the feeders depend on.
+
+* :class:`FakeOllama` serves ``POST /api/generate`` like Ollama, streaming
+  NDJSON tokens after a configurable first-token latency and per-token delay.
+* :class:`FeedServer` serves the synthetic fixtures over HTTP; any feed URL can
+  be routed to it with :func:`route_url`.
+* :func:`install_md2pdf_stub` puts a fake ``md2pdf`` command on ``PATH`` that
+  writes a minimal PDF immediately.
+* :func:`offline_environment` wires all of them into the fetcher, the LLM kernel
+  and the PDF renderer for the duration of a ``with`` block.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from benchmarks.fixtures import FEEDS
+
+WORDS = "the study proposes a method that improves results on several benchmarks with lower cost".split()
+
+
+class _Server:
+    """A ThreadingHTTPServer on an ephemeral localhost port, usable as a context manager."""
+
+    handler = BaseHTTPRequestHandler
+
+    def __init__(self):
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.owner.lock:
+            self.server.owner.connections += 1
+
+    def do_POST(self):
+        owner = self.server.owner
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with owner.lock:
+            owner.requests += 1
+        time.sleep(owner.latency)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in owner.tokens_for(body.get("prompt", "")):
+            if owner.token_latency:
+                time.sleep(owner.token_latency)
+            self._chunk({"model": body.get("model"), "response": token, "done": False})
+        self._chunk({"model": body.get("model"), "response": "", "done": True,
+                     "prompt_eval_count": len(body.get("prompt", "")) // 4, "eval_count": owner.output_tokens})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, message: Dict):
+        line = (json.dumps(message) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+
+
+class FakeOllama(_Server):
+    """Fake Ollama server.
+
+    Args:
+        latency: Seconds before the first token (model load + prompt evaluation).
+        token_latency: Seconds between streamed tokens.
+        output_tokens: Number of tokens in each answer.
+    """
+
+    handler = _OllamaHandler
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0, output_tokens: int = 64):
+        super().__init__()
+        self.latency = latency
+        self.token_latency = token_latency
+        self.output_tokens = output_tokens
+        self.requests = 0
+        # TCP connections accepted; fewer than requests when clients reuse keep-alive connections
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def tokens_for(self, prompt: str):
+        # Deterministic per prompt, so repeated samples of one prompt agree
+        seed = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).digest()[0]
+        yield "<think>reasoning</think>"
+        for i in range(self.output_tokens):
+            yield " " + WORDS[(seed + i) % len(WORDS)]
+
+
+class _FeedHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        # /<source>/<size>/<offset>.xml
+        try:
+            source, size, offset = os.path.splitext(urlparse(self.path).path.strip("/"))[0].split("/")
+            body = self.server.owner.feed(source, int(size), int(offset))
+        except (ValueError, KeyError):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FeedServer(_Server):
+    """Serve ``FEEDS[source](size, offset=offset)`` at ``/<source>/<size>/<offset>.xml``."""
+
+    handler = _FeedHandler
+
+    def __init__(self):
+        super().__init__()
+        self._cache: Dict[Tuple[str, int, int], bytes] = {}
+        self._routes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def feed(self, source: str, size: int, offset: int = 0) -> bytes:
+        key = (source, size, offset)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = FEEDS[source](size, seed=offset, offset=offset).encode("utf-8")
+            return self._cache[key]
+
+    def url(self, source: str, size: int, offset: int = 0) -> str:
+        return f"{self.base_url}/{source}/{size}/{offset}.xml"
+
+
+def source_of(url: str) -> str:
+    """Fixture source matching a real feed URL."""
+    host = urlparse(url).netloc
+    for source in ("arxiv", "pubmed", "wiley"):
+        if source in host:
+            return source
+    return "news"
+
+
+def route_url(server: FeedServer, url: str, size: int) -> str:
+    """Map a real feed *url* onto a fixture of *size* entries with its own id range."""
+    with server._lock:
+        index = server._routes.setdefault(url, len(server._routes))
+    return server.url(source_of(url), size, index * size)
+
+
+MD2PDF_STUB = """#!{python}
+import sys
+with open(sys.argv[2], "wb") as f:
+    f.write(b"%PDF-1.4\\n%%EOF\\n")
+"""
+
+
+def install_md2pdf_stub(directory: str) -> str:
+    """Write an executable fake ``md2pdf`` into *directory* and return its path."""
+    path = os.path.join(directory, "md2pdf")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(MD2PDF_STUB.format(python=sys.executable))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+@contextlib.contextmanager
+def offline_environment(llm_latency: float = 0.0,
+                        token_latency: float = 0.0,
+                        output_tokens: int = 64,
+                        pdf_backend: str = "md2pdf") -> Iterator[Dict]:
+    """Run the block against fake services, inside a fresh temporary working directory.
+
+    The LLM kernel is pointed at a :class:`FakeOllama` with its response cache
+    disabled, and PDFs are rendered with the stub ``md2pdf`` unless
+    *pdf_backend* is ``'fpdf'``.  Yields a dict with the ``feeds`` and ``ollama``
+    servers and the temporary ``workdir``; everything is restored afterwards.
+    """
+    import paper_reader_kernel
+    import pdf_renderer
+    from llm_backends import OllamaHTTPBackend
+
+    saved = (paper_reader_kernel.LLM_BACKEND, paper_reader_kernel.LLM_CACHE, pdf_renderer.PDF_BACKEND,
+             os.environ.get("PATH", ""), os.getcwd())
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir, FeedServer() as feeds, \
+            FakeOllama(llm_latency, token_latency, output_tokens) as ollama:
+        bin_dir = os.path.join(workdir, "bin")
+        os.makedirs(bin_dir)
+        install_md2pdf_stub(bin_dir)
+        try:
+            os.environ["PATH"] = bin_dir + os.pathsep + saved[3]
+            paper_reader_kernel.set_llm_backend(OllamaHTTPBackend(ollama.base_url))
+            paper_reader_kernel.set_llm_cache(None)
+            pdf_renderer.PDF_BACKEND = pdf_backend
+            os.chdir(workdir)
+            yield {"feeds": feeds, "ollama": ollama, "workdir": workdir}
+        finally:
+            os.chdir(saved[4])
+            os.environ["PATH"] = saved[3]
+            pdf_renderer.PDF_BACKEND = saved[2]
+            paper_reader_kernel.set_llm_backend(saved[0])
+            paper_reader_kernel.set_llm_cache(saved[1])
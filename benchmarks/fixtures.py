@@ -0,0 +1,88 @@
+"""Synthetic RSS/Atom fixtures for offline benchmarks.
+
+Every generator returns an XML string shaped like the real source (arXiv,
+PubMed, Wiley, news) with *n* entries, so benchmarks run without network access.
+Entry identifiers start at *offset*, so several feeds of one source can be
+generated without their entries colliding.
+"""
+import random
+from typing import Callable, Dict
+
+WORDS = ("model learning neural data network method results propose training performance "
+         "attention graph diffusion language vision clinical patients cohort market growth "
+         "policy inflation bank trade economy analysis robust efficient novel framework").split()
+
+
+def _sentence(rng: random.Random, n: int = 20) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _rss(title: str, items: str, extra_ns: str = "") -> str:
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"{extra_ns}><channel>'
+            f'<title>{title}</title><link>https://example.org/</link><description>{title}</description>'
+            f'{items}</channel></rss>')
+
+
+def arxiv_feed(n: int, seed: int = 0, offset: int = 0) -> str:
+    rng = random.Random(seed)
+    items = []
+    for i in range(offset, offset + n):
+        authors = ", ".join(f"Author {rng.randint(1, 999)}" for _ in range(rng.randint(1, 6)))
+        items.append(
+            f"<item><title>{_sentence(rng, 8)}</title>"
+            f"<link>https://arxiv.org/abs/2401.{i:05d}</link>"
+            f"<description>arXiv:2401.{i:05d}v1 Announce Type: new Abstract: {_sentence(rng, 120)}</description>"
+            f"<dc:creator>{authors}</dc:creator>"
+            f"<pubDate>Mon, 01 Jan 2024 00:00:00 -0500</pubDate></item>")
+    return _rss("cs.AI updates on arXiv.org", "".join(items), ' xmlns:dc="http://purl.org/dc/elements/1.1/"')
+
+
+def pubmed_feed(n: int, seed: int = 0, offset: int = 0) -> str:
+    rng = random.Random(seed)
+    items = []
+    for i in range(offset, offset + n):
+        abstract = "".join(f"<p>{_sentence(rng, 40)}</p>" for _ in range(3))
+        items.append(
+            f"<item><title>{_sentence(rng, 10)}</title>"
+            f"<link>https://pubmed.ncbi.nlm.nih.gov/{30000000 + i}/?utm_source=rss</link>"
+            f"<description><![CDATA[{abstract}]]></description>"
+            f"<pubDate>Tue, 02 Jan 2024 06:00:00 -0500</pubDate></item>")
+    return _rss("pubmed: search", "".join(items))
+
+
+def wiley_feed(n: int, seed: int = 0, offset: int = 0) -> str:
+    rng = random.Random(seed)
+    items = []
+    for i in range(offset, offset + n):
+        abstract = "".join(f"<p>{_sentence(rng, 50)} <i>In vivo</i> &amp; <b>in vitro</b>.</p>" for _ in range(2))
+        items.append(
+            f"<item><title>{_sentence(rng, 9)}</title>"
+            f"<link>https://onlinelibrary.wiley.com/doi/10.1111/abc.{i}</link>"
+            f"<dc:creator>Author {i}</dc:creator><dc:identifier>doi:10.1111/abc.{i}</dc:identifier>"
+            f"<content:encoded><![CDATA[{abstract}]]></content:encoded>"
+            f"<pubDate>Wed, 03 Jan 2024 00:00:00 GMT</pubDate></item>")
+    return _rss("Wiley: Most Recent", "".join(items),
+                ' xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:content="http://purl.org/rss/1.0/modules/content/"')
+
+
+def news_feed(n: int, seed: int = 0, offset: int = 0) -> str:
+    rng = random.Random(seed)
+    items = []
+    for i in range(offset, offset + n):
+        summary = f'<p>{_sentence(rng, 30)}</p><p><a href="https://news.example.com/{i}">Read more</a></p>'
+        items.append(
+            f"<item><title>{_sentence(rng, 10)}</title>"
+            f"<link>https://news.example.com/story/{i}?ref=rss&amp;src=feed</link>"
+            f"<description><![CDATA[{summary}]]></description>"
+            f"<author>desk@news.example.com (News Desk)</author>"
+            f"<pubDate>Thu, 04 Jan 2024 08:00:00 GMT</pubDate></item>")
+    return _rss("World News", "".join(items))
+
+
+FEEDS: Dict[str, Callable[..., str]] = {
+    'arxiv': arxiv_feed,
+    'pubmed': pubmed_feed,
+    'wiley': wiley_feed,
+    'news': news_feed,
+}
+SIZES = (10, 100, 1000)
@@ -0,0 +1,99 @@
+"""Cold-start and import-time benchmark for the CLI and the feeder modules.
+
+Each case runs in a fresh interpreter, so nothing is already imported.  The
+cases are:
+
+* ``python -c pass``, the interpreter's own startup, which is subtracted from the others.
+* ``import <module>`` for the CLI, the fetcher, the LLM kernel, the PDF renderer and both feeders.
+* ``cli.py fetch`` on a synthetic arXiv feed (a complete fetch-only run).
+
+The run fails when the fetch-only run takes longer than ``--budget-ms`` above
+interpreter startup, or when it loads a heavy module (PyMuPDF, FPDF, NumPy,
+multiprocessing, subprocess) that fetching does not need.
+
+Usage: python -m benchmarks.startup [--repeat 5] [--budget-ms 300] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import arxiv_feed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('cli', 'universal_rss_fetcher2', 'paper_reader_kernel', 'pdf_renderer', 'paper_feeder', 'news_feeder')
+# Modules a fetch-only run must not import
+HEAVY = ('fitz', 'pymupdf', 'fpdf', 'numpy', 'multiprocessing', 'subprocess')
+
+_REPORT = "import sys; print('LOADED=' + ','.join(m for m in {heavy!r} if m in sys.modules), file=sys.stderr)"
+
+
+def run_python(code: str, repeat: int) -> dict:
+    """Time ``python -c code`` in fresh interpreters; *code* may report loaded heavy modules on stderr."""
+    timings, stderr = [], ''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            raise RuntimeError(f"Benchmark case failed: {code}\n{process.stderr}")
+        stderr = process.stderr
+    loaded = [line[len('LOADED='):] for line in stderr.splitlines() if line.startswith('LOADED=')]
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'runs': repeat,
+        'heavy_modules': loaded[0].split(',') if loaded and loaded[0] else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=300.0,
+                        help='allowed fetch-only run time above interpreter startup')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    report = _REPORT.format(heavy=HEAVY)
+    results = {'python': sys.version.split()[0], 'cases': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        feed_path = os.path.join(workdir, 'arxiv.xml')
+        with open(feed_path, 'w', encoding='utf-8') as f:
+            f.write(arxiv_feed(50))
+        md_path = os.path.join(workdir, 'arxiv.md')
+        cases = {'python': 'pass'}
+        cases.update({f'import {name}': f'import {name}; {report}' for name in MODULES})
+        cases['cli fetch'] = (f"import sys, cli; sys.stdout = open({os.devnull!r}, 'w'); "
+                              f"cli.main(['fetch', {feed_path!r}, '-o', {md_path!r}]); {report}")
+        for name, code in cases.items():
+            results['cases'][name] = timing = run_python(code, args.repeat)
+            print(f"{name:<32} median={timing['median'] * 1000:8.1f}ms min={timing['min'] * 1000:8.1f}ms "
+                  f"heavy={','.join(timing['heavy_modules']) or '-'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved: {args.output}")
+
+    baseline = results['cases']['python']['median']
+    fetch = results['cases']['cli fetch']
+    overhead_ms = (fetch['median'] - baseline) * 1000
+    print(f"\nfetch-only run: {overhead_ms:.1f}ms above interpreter startup (budget {args.budget_ms:.0f}ms)")
+    errors = []
+    if overhead_ms > args.budget_ms:
+        errors.append(f"fetch-only run exceeds the {args.budget_ms:.0f}ms budget")
+    if fetch['heavy_modules']:
+        errors.append(f"fetch-only run imports {', '.join(fetch['heavy_modules'])}")
+    for error in errors:
+        print(f"[ERROR] {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
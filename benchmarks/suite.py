@@ -0,0 +1,224 @@
+"""End-to-end offline benchmark suite with baseline comparison.
+
+Times the fetcher (``fetch_universal_rss``, ``parse_entries``,
+``format_entries_text``, ``save_markdown``), ``ask_deepseek`` and a full
+``job()`` of ``paper_feeder`` and ``news_feeder`` against synthetic feeds, a fake
+Ollama server and a stub ``md2pdf`` (see :mod:`benchmarks.fakes`), so it needs
+no network access.  Results are written as JSON; with ``--baseline`` every case
+is compared to an earlier result file and the run fails when a case is slower
+than the baseline by more than ``--threshold``.
+
+Usage:
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --baseline before.json --output after.json [--threshold 0.2]
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import types
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import feedparser
+
+from benchmarks.fakes import offline_environment, route_url
+from benchmarks.fixtures import FEEDS, SIZES
+
+PROMPT = 'For each article, keep the full title and write a 1-2 sentence summary.'
+FEEDERS = ('paper_feeder', 'news_feeder')
+
+
+def load_feeder(name: str) -> types.ModuleType:
+    """Import a fresh copy of the feeder script *name* (not shared with ``sys.modules``).
+
+    The feeders only start their scheduler under ``__main__``, so importing
+    them has no side effects; a private copy keeps patches to one copy out of
+    the others.
+    """
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), f'{name}.py')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def offline_feeder(name: str, feeds, size: int) -> types.ModuleType:
+    """Load a feeder whose fetcher reads every feed URL from the local fixture server."""
+    module = load_feeder(name)
+
+    class OfflineFetcher(module.UniversalRSSFetcher):
+        def fetch_rss(self, url):
+            return super().fetch_rss(route_url(feeds, url, size))
+
+    module.UniversalRSSFetcher = OfflineFetcher
+    return module
+
+
+def time_case(func: Callable, setup: Optional[Callable] = None, repeat: int = 5, quiet: bool = True) -> Dict:
+    """Run ``func(setup())`` *repeat* times and summarize the wall-clock timings."""
+    timings = []
+    for run in range(repeat):
+        arg = setup(run) if setup else None
+        output = io.StringIO() if quiet else sys.stdout
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            func(arg)
+            timings.append(time.perf_counter() - start)
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'max': max(timings),
+        'runs': repeat,
+    }
+
+
+def build_cases(env: Dict, sizes: List[int], feeder_size: int) -> Dict[str, tuple]:
+    """Return ``{name: (func, setup)}`` for every benchmark case."""
+    from paper_reader_kernel import ask_deepseek
+    from universal_rss_fetcher2 import UniversalRSSFetcher
+
+    feeds, workdir = env['feeds'], env['workdir']
+    fetcher = UniversalRSSFetcher()
+    cases = {}
+
+    def fresh_path(prefix: str, suffix: str = '.md') -> Callable[[int], str]:
+        counter = iter(range(10 ** 9))
+        return lambda run: os.path.join(workdir, f'{prefix}_{next(counter)}{suffix}')
+
+    for source in sorted(FEEDS):
+        for size in sizes:
+            tag = f'{source}/{size}'
+            url = feeds.url(source, size)
+            feed = feedparser.parse(feeds.feed(source, size))
+            config = fetcher.source_configs[source]
+            entries = fetcher.parse_entries(feed, config)
+
+            cases[f'fetch_universal_rss/{tag}'] = (
+                lambda md, url=url, source=source: UniversalRSSFetcher().fetch_universal_rss(url, source, md_file=md),
+                fresh_path(f'fetch_{source}_{size}'))
+            cases[f'parse_entries/{tag}'] = (
+                lambda _, feed=feed, config=config: fetcher.parse_entries(feed, config), None)
+            cases[f'format_entries_text/{tag}'] = (
+                lambda _, entries=entries: fetcher.format_entries_text(entries), None)
+            cases[f'save_markdown/{tag}'] = (
+                lambda md, entries=entries, config=config: fetcher.save_markdown(entries, md, config['feed_name']),
+                fresh_path(f'save_{source}_{size}'))
+
+    for size in sizes:
+        text = fetcher.format_entries_text(
+            fetcher.parse_entries(feedparser.parse(feeds.feed('arxiv', size)), fetcher.source_configs['arxiv']))
+        cases[f'ask_deepseek/arxiv/{size}'] = (
+            lambda md, text=text: ask_deepseek(PROMPT, text, md, md.replace('.md', '.pdf'),
+                                               iteration_num=3, context_tokens=32768),
+            fresh_path(f'summary_{size}'))
+
+    for name in FEEDERS:
+        def run_job(run_dir, name=name):
+            os.makedirs(run_dir)
+            os.chdir(run_dir)
+            try:
+                offline_feeder(name, feeds, feeder_size).job()
+            finally:
+                os.chdir(workdir)
+        cases[f'job/{name}/{feeder_size}'] = (run_job, fresh_path(f'job_{name}', ''))
+
+    return cases
+
+
+# Settings that change what a case measures; sizes and repeat counts only change which cases run
+_COMPARABLE_SETTINGS = ('feeder_size', 'llm_latency', 'token_latency', 'output_tokens', 'pdf')
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_delta: float = 0.001) -> List[str]:
+    """Print a comparison table and return the names of regressed cases.
+
+    A case regresses when its median is more than *threshold* (a fraction)
+    slower than the baseline and by at least *min_delta* seconds, which keeps
+    sub-millisecond cases from failing on timer noise.
+    """
+    regressions = []
+    print(f"\n{'case':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if before is None:
+            print(f"{name:<40} {'-':>10} {current['median'] * 1000:9.2f}ms {'new':>8}")
+            continue
+        ratio = current['median'] / before['median'] if before['median'] else 1.0
+        flag = ''
+        if ratio > 1 + threshold and current['median'] - before['median'] >= min_delta:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f"{name:<40} {before['median'] * 1000:9.2f}ms {current['median'] * 1000:9.2f}ms "
+              f"{(ratio - 1):+8.1%}{flag}")
+    for key in _COMPARABLE_SETTINGS:
+        if baseline.get('settings', {}).get(key) != results['settings'][key]:
+            print(f"[WARN] Baseline setting {key}={baseline.get('settings', {}).get(key)!r} "
+                  f"differs from {results['settings'][key]!r}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='feed sizes to benchmark')
+    parser.add_argument('--feeder-size', type=int, default=100, help='entries per feed in the job() runs')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='fake Ollama first-token latency (s)')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='fake Ollama per-token latency (s)')
+    parser.add_argument('--output-tokens', type=int, default=64, help='tokens in each fake answer')
+    parser.add_argument('--pdf', choices=('md2pdf', 'fpdf'), default='md2pdf',
+                        help="'md2pdf' uses the stub command, 'fpdf' the real in-process renderer")
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the results')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before failing (0.2 = 20%%)')
+    parser.add_argument('--min-delta', type=float, default=0.001,
+                        help='ignore slowdowns smaller than this many seconds')
+    parser.add_argument('--verbose', action='store_true', help='show the output of the benchmarked code')
+    args = parser.parse_args()
+
+    settings = {
+        'sizes': args.sizes, 'feeder_size': args.feeder_size, 'repeat': args.repeat,
+        'llm_latency': args.llm_latency, 'token_latency': args.token_latency,
+        'output_tokens': args.output_tokens, 'pdf': args.pdf,
+    }
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': settings,
+        'cases': {},
+    }
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    with offline_environment(args.llm_latency, args.token_latency, args.output_tokens, args.pdf) as env:
+        cases = build_cases(env, args.sizes, args.feeder_size)
+        for name, (func, setup) in cases.items():
+            if args.filter not in name:
+                continue
+            results['cases'][name] = timing = time_case(func, setup, args.repeat, quiet=not args.verbose)
+            print(f"{name:<40} median={timing['median'] * 1000:9.2f}ms min={timing['min'] * 1000:9.2f}ms")
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results saved: {output}")
+
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_delta)
+        if regressions:
+            print(f"[ERROR] {len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
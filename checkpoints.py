@@ -0,0 +1,137 @@
+"""Checkpoints of summarization runs, so an interrupted job resumes where it stopped.
+
+Every feed item of a run is registered with its LLM input text and output
+paths once its Markdown is written, and every LLM call of its summary
+(``iteration:i``, ``map:i``, ``merge:level:i``, ``merge``) is saved as soon as
+it returns.  After a crash or a failed LLM call, :meth:`CheckpointStore.pending`
+gives back the unfinished items of every run; summarizing them again replays
+the saved calls and only queries the model for the missing ones.
+
+Units are keyed by the hash of their request, so a changed prompt or input
+never reuses a stale answer.  A finished item's units are deleted.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Item keys saved with a run; enough to run the llm and pdf stages again
+ITEM_FIELDS = ('category', 'url', 'source_type', 'raw_md', 'summary_md', 'summary_pdf', 'raw_text', 'text',
+               'seen_keys')
+
+
+class Checkpoint:
+    """Saved LLM calls of one item (category or source) of one run."""
+
+    def __init__(self, store: 'CheckpointStore', job: str, run: str, category: str):
+        self.store = store
+        self.job = job
+        self.run = run
+        self.category = category
+
+    def get(self, unit: str, key: str) -> Optional[str]:
+        """The saved output of *unit*, if it was made from the same request *key*."""
+        return self.store._get_unit(self.job, self.run, self.category, unit, key)
+
+    def put(self, unit: str, key: str, output: str):
+        self.store._put_unit(self.job, self.run, self.category, unit, key, output)
+
+
+class RunCheckpoints:
+    """Registers the items of one run; passed to :func:`pipeline.make_feed_stages`."""
+
+    def __init__(self, store: 'CheckpointStore', job: str, run: str):
+        self.store = store
+        self.job = job
+        self.run = run
+
+    def begin(self, item: Dict) -> Checkpoint:
+        """Register *item* as unfinished (again, if its input changed) and return its checkpoint."""
+        category = str(item.get('category') or item.get('url'))
+        payload = json.dumps({field: item.get(field) for field in ITEM_FIELDS}, ensure_ascii=False)
+        with self.store._lock:
+            self.store._conn.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, 0, ?)",
+                                     (self.job, self.run, category, payload, time.time()))
+            self.store._conn.commit()
+        return Checkpoint(self.store, self.job, self.run, category)
+
+    def finish(self, item: Dict):
+        """Mark *item* as summarized and drop its saved LLM calls."""
+        category = str(item.get('category') or item.get('url'))
+        with self.store._lock:
+            self.store._conn.execute("UPDATE items SET done = 1 WHERE job = ? AND run = ? AND category = ?",
+                                     (self.job, self.run, category))
+            self.store._conn.execute("DELETE FROM units WHERE job = ? AND run = ? AND category = ?",
+                                     (self.job, self.run, category))
+            self.store._conn.commit()
+
+
+class CheckpointStore:
+    """SQLite store of run items and their completed LLM calls, shared across threads."""
+
+    def __init__(self, db_path: str = "./checkpoints.sqlite3", keep_days: float = 14.0):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " job TEXT, run TEXT, category TEXT, item TEXT, done INTEGER, started REAL,"
+            " PRIMARY KEY (job, run, category))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS units ("
+            " job TEXT, run TEXT, category TEXT, unit TEXT, key TEXT, output TEXT, saved REAL,"
+            " PRIMARY KEY (job, run, category, unit))"
+        )
+        # Registrations older than keep_days are forgotten, finished or not
+        self._conn.execute("DELETE FROM items WHERE started < ?", (time.time() - keep_days * 86400,))
+        self._conn.execute("DELETE FROM units WHERE saved < ?", (time.time() - keep_days * 86400,))
+        self._conn.commit()
+
+    def run(self, job: str, run: str) -> RunCheckpoints:
+        return RunCheckpoints(self, job, run)
+
+    def _get_unit(self, job: str, run: str, category: str, unit: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output FROM units WHERE job = ? AND run = ? AND category = ? AND unit = ? AND key = ?",
+                (job, run, category, unit, key)).fetchone()
+        return row[0] if row else None
+
+    def _put_unit(self, job: str, run: str, category: str, unit: str, key: str, output: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (job, run, category, unit, key, output, time.time()))
+            self._conn.commit()
+
+    def items(self, job: str, run: str, pending_only: bool = False) -> List[Dict]:
+        """Registered items of a run in registration order, each with a ``checkpoint``."""
+        sql = "SELECT category, item FROM items WHERE job = ? AND run = ?"
+        if pending_only:
+            sql += " AND done = 0"
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY started", (job, run)).fetchall()
+        items = []
+        for category, payload in rows:
+            item = json.loads(payload)
+            item['run'] = run
+            item['checkpoint'] = Checkpoint(self, job, run, category)
+            item['pdf_jobs'] = [(item['raw_md'], item['raw_md'].replace('.md', '.pdf'))]
+            items.append(item)
+        return items
+
+    def pending(self, job: str) -> List[Tuple[str, List[Dict]]]:
+        """``(run, unfinished items)`` of every run of *job* with unfinished items, oldest run first.
+
+        The items are ready for the llm and pdf stages of :func:`pipeline.make_feed_stages`.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run FROM items WHERE job = ? AND done = 0 GROUP BY run ORDER BY MIN(started)",
+                (job,)).fetchall()
+        return [(run, self.items(job, run, pending_only=True)) for (run,) in rows]
@@ -0,0 +1,178 @@
+"""One-shot command line entry point for the feeders.
+
+Every subcommand imports only what it needs: ``fetch`` loads the RSS fetcher
+(feedparser) but not the LLM client, PyMuPDF, FPDF or NumPy, so it starts
+quickly from cron or a shell.  ``python -m benchmarks.startup`` checks this.
+
+Usage:
+    python cli.py fetch https://export.arxiv.org/rss/cs.LG -o cs_lg.md
+    python cli.py fetch feed.xml --source-type wiley --json -o entries.json
+    python cli.py summarize paper.pdf -o paper_summary.md --pdf
+    python cli.py render feed_folder/feeds_20250101_23/*.md
+    python cli.py run-once paper --only cs.AI cs.LG
+    python cli.py run-once news --resume
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+# Feeder scripts: (module, keyword argument of job() selecting feeds)
+FEEDERS = {
+    'paper': ('paper_feeder', 'categories'),
+    'news': ('news_feeder', 'sources'),
+}
+
+DEFAULT_PROMPT = ('For each article, keep the full title and write a 1-2 sentence summary '
+                  'focusing on objective, method, and key findings.')
+
+
+def cmd_fetch(args) -> int:
+    from concurrent.futures import ThreadPoolExecutor
+    from universal_rss_fetcher2 import UniversalRSSFetcher
+
+    cache = seen_index = None
+    if args.cache_dir:
+        from feed_cache import FeedCache
+        cache = FeedCache(args.cache_dir)
+    if args.seen_index:
+        from seen_index import SeenIndex
+        seen_index = SeenIndex(args.seen_index)
+    # The fetcher only reads the seen index, so new entries are left for the feeders
+    fetcher = UniversalRSSFetcher(timeout=args.timeout, cache=cache, seen_index=seen_index, stream=args.stream)
+
+    def fetch_one(url):
+        feed = fetcher.with_retries(url, lambda: fetcher.fetch_rss(url), args.retries)
+        config = fetcher.resolve_config(feed, args.source_type)
+        return config, fetcher.parse_records(feed, config)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(args.urls)))) as executor:
+        results = list(executor.map(fetch_one, args.urls))
+    entries = [entry for _, records in results for entry in records]
+    feed_name = results[0][0].get('feed_name', 'RSS Feed') if len(results) == 1 else 'RSS Feeds'
+
+    if args.json:
+        import json
+        text = json.dumps([entry.to_dict() for entry in entries], ensure_ascii=False, indent=1, default=str)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text)
+            print(f"✅ JSON saved: {args.output}")
+        else:
+            print(text)
+    elif args.output:
+        fetcher.render_entries(entries, args.output, feed_name, with_text=False)
+    else:
+        print(fetcher.render_entries(entries))
+    print(f"{len(entries)} entries from {len(args.urls)} feed(s)", file=sys.stderr)
+    return 0
+
+
+def cmd_summarize(args) -> int:
+    import paper_reader_kernel as kernel
+
+    if args.input.lower().endswith('.pdf'):
+        # Read page by page into prompt-sized chunks; more than one is summarized map-reduce
+        budget = kernel.content_budget(args.prompt, args.context_tokens)
+        text = list(kernel.iter_pdf_text_chunks(args.input, budget, max_pages=args.max_pages))
+        if len(text) > 1:
+            print(f"{args.input}: {len(text)} chunks of at most {budget} tokens", file=sys.stderr)
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            text = f.read()
+    output = args.output or f"{os.path.splitext(args.input)[0]}_summary.md"
+    if os.path.exists(output) and args.force:
+        os.remove(output)
+    kernel.ask_deepseek(
+        args.prompt,
+        text,
+        output,
+        os.path.splitext(output)[0] + '.pdf',
+        llm_model=args.model,
+        llm_model_merge=args.merge_model or args.model,
+        iteration_num=args.iterations,
+        context_tokens=args.context_tokens,
+        render_pdf=args.pdf,
+    )
+    return 0
+
+
+def cmd_render(args) -> int:
+    from pdf_renderer import render_batch
+
+    records = render_batch([(md, os.path.splitext(md)[0] + '.pdf') for md in args.markdown],
+                           workers=args.workers, backend=args.backend, force=args.force)
+    failed = [record for record in records if record['status'] == 'failed']
+    for record in failed:
+        print(f"[ERROR] {record['md']}: {record['error']}")
+    return 1 if failed else 0
+
+
+def cmd_run_once(args) -> int:
+    import importlib
+
+    module_name, selector = FEEDERS[args.feeder]
+    feeder = importlib.import_module(module_name)
+    if args.resume:
+        resumed = feeder.resume()
+        if not resumed:
+            print("Nothing to resume")
+        return 0
+    kwargs = {selector: args.only} if args.only else {}
+    feeder.job(summarize=not args.no_summarize, **kwargs)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch = commands.add_parser('fetch', help='fetch and parse feeds (no LLM, no PDF)')
+    fetch.add_argument('urls', nargs='+', help='feed URLs, local files or raw XML')
+    fetch.add_argument('--source-type', help="arxiv, pubmed, wiley or news (auto-detected by default)")
+    fetch.add_argument('-o', '--output', help='write Markdown (or JSON with --json) here instead of text to stdout')
+    fetch.add_argument('--json', action='store_true', help='output the parsed entries as JSON')
+    fetch.add_argument('--stream', action='store_true', help='parse large feeds incrementally')
+    fetch.add_argument('--cache-dir', help='conditional-GET cache directory')
+    fetch.add_argument('--seen-index', help='skip entries recorded in this seen-entries database (not updated)')
+    fetch.add_argument('--timeout', type=float, default=30.0)
+    fetch.add_argument('--retries', type=int, default=2)
+    fetch.add_argument('--workers', type=int, default=4)
+    fetch.set_defaults(func=cmd_fetch)
+
+    summarize = commands.add_parser('summarize', help='summarize a text, Markdown or PDF file with the LLM')
+    summarize.add_argument('input')
+    summarize.add_argument('-o', '--output', help='summary Markdown file (default: <input>_summary.md)')
+    summarize.add_argument('--prompt', default=DEFAULT_PROMPT)
+    summarize.add_argument('--model', default='deepseek-r1:70b')
+    summarize.add_argument('--merge-model', help='model for merging samples (default: --model)')
+    summarize.add_argument('--iterations', type=int, default=3)
+    summarize.add_argument('--context-tokens', type=int, default=32768)
+    summarize.add_argument('--max-pages', type=int, default=50, help='pages read from a PDF input')
+    summarize.add_argument('--pdf', action='store_true', help='also render the summary to PDF')
+    summarize.add_argument('--force', action='store_true', help='overwrite an existing summary')
+    summarize.set_defaults(func=cmd_summarize)
+
+    render = commands.add_parser('render', help='render Markdown files to PDF')
+    render.add_argument('markdown', nargs='+')
+    render.add_argument('--backend', choices=('fpdf', 'md2pdf'))
+    render.add_argument('--workers', type=int)
+    render.add_argument('--force', action='store_true', help='render even if the Markdown is unchanged')
+    render.set_defaults(func=cmd_render)
+
+    run_once = commands.add_parser('run-once', help="run one feeder job now (for cron)")
+    run_once.add_argument('feeder', choices=sorted(FEEDERS))
+    run_once.add_argument('--only', nargs='+', help='arXiv categories or news sources to process')
+    run_once.add_argument('--no-summarize', action='store_true', help='fetch and render without the LLM')
+    run_once.add_argument('--resume', action='store_true', help='finish interrupted or failed runs instead')
+    run_once.set_defaults(func=cmd_run_once)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
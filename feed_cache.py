@@ -0,0 +1,65 @@
+"""On-disk HTTP conditional-GET cache for RSS feeds.
+
+Each feed URL is stored as one JSON file holding its ETag, Last-Modified and the
+parsed feedparser entries, so that a ``304 Not Modified`` answer can be served
+without downloading or re-parsing the feed.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import feedparser
+
+
+def _to_feedparser_dict(value: Any) -> Any:
+    """Recursively restore JSON data to attribute-accessible FeedParserDicts."""
+    if isinstance(value, dict):
+        return feedparser.FeedParserDict({k: _to_feedparser_dict(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_feedparser_dict(v) for v in value]
+    return value
+
+
+class FeedCache:
+    """ETag / Last-Modified cache for parsed feeds, one JSON file per URL."""
+
+    def __init__(self, cache_dir: str = "./.feed_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return ``{'etag', 'modified', 'feed'}`` for *url*, or None when not cached."""
+        path = self._path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring unreadable feed cache {path}: {e}")
+            return None
+        record["feed"] = _to_feedparser_dict(record.get("feed", {}))
+        return record
+
+    def put(self, url: str, feed: Any, etag: Optional[str] = None, modified: Optional[str] = None):
+        """Store the parsed *feed* of *url* with its validators."""
+        if not etag and not modified:
+            # Without validators the server can never answer 304
+            return
+        record = {
+            "url": url,
+            "etag": etag,
+            "modified": modified,
+            "feed": {"feed": feed.get("feed", {}), "entries": feed.get("entries", [])},
+        }
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
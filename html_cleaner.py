@@ -0,0 +1,143 @@
+"""HTML-to-text cleaning shared by every feed source.
+
+Abstracts and news summaries often carry ``<p>``/inline markup that only
+inflates LLM prompts.  :func:`clean_html` strips it with a regex fast path for
+simple, well-formed markup and falls back to BeautifulSoup only when the markup
+is unusual or malformed.  Both paths produce the same text: whitespace is
+collapsed, block elements become paragraphs separated by a blank line and
+``<br>`` becomes a line break.  Results are memoized by content hash.
+"""
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+
+BLOCK_TAGS = frozenset({
+    'p', 'div', 'li', 'ul', 'ol', 'blockquote', 'section', 'article', 'header', 'footer',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dl', 'dt', 'dd', 'figcaption', 'pre',
+})
+INLINE_TAGS = frozenset({
+    'a', 'b', 'i', 'em', 'strong', 'span', 'sub', 'sup', 'u', 'small', 'code', 'font',
+    'abbr', 'cite', 'q', 's', 'strike', 'mark', 'time', 'tt', 'big',
+})
+VOID_TAGS = frozenset({'br', 'img', 'hr', 'wbr'})
+DROP_TAGS = frozenset({'script', 'style', 'head', 'title', 'noscript'})
+
+TAG_RE = re.compile(r'<(?:(/?)([a-zA-Z][a-zA-Z0-9]*)(?:\s[^<>]*?)?\s*(/?)>|!--.*?-->)', re.S)
+CONTROL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Markers for paragraph and line breaks while assembling text
+_PARA = '\x00'
+_LINE = '\x01'
+
+MEMO_SIZE = 4096
+_memo: "OrderedDict[bytes, str]" = OrderedDict()
+_memo_lock = threading.Lock()
+stats = {'hits': 0, 'fast': 0, 'fallback': 0}
+
+
+def _assemble(text: str) -> str:
+    paragraphs = []
+    for paragraph in text.split(_PARA):
+        lines = [' '.join(line.split()) for line in paragraph.split(_LINE)]
+        lines = [line for line in lines if line]
+        if lines:
+            paragraphs.append('\n'.join(lines))
+    return '\n\n'.join(paragraphs)
+
+
+def _clean_fast(markup: str):
+    """Regex tokenizer for known, balanced tags; returns None when the markup needs a real parser."""
+    pieces, stack, pos = [], [], 0
+    for match in TAG_RE.finditer(markup):
+        text = markup[pos:match.start()]
+        if '<' in text or '>' in text:
+            return None
+        pieces.append(html.unescape(text))
+        pos = match.end()
+
+        closing, tag, self_closing = match.group(1), match.group(2), match.group(3)
+        if tag is None:
+            continue  # comment
+        tag = tag.lower()
+        if tag in VOID_TAGS:
+            if tag == 'br':
+                pieces.append(_LINE)
+            continue
+        if tag not in BLOCK_TAGS and tag not in INLINE_TAGS:
+            return None
+        if self_closing:
+            continue
+        if closing:
+            if not stack or stack.pop() != tag:
+                return None
+        else:
+            stack.append(tag)
+        if tag in BLOCK_TAGS:
+            pieces.append(_PARA)
+
+    text = markup[pos:]
+    if stack or '<' in text or '>' in text:
+        return None
+    pieces.append(html.unescape(text))
+    return _assemble(''.join(pieces))
+
+
+def _clean_soup(markup: str) -> str:
+    """Full-parser path for malformed or unusual markup."""
+    from bs4 import BeautifulSoup, NavigableString, Comment
+
+    soup = BeautifulSoup(markup, 'html.parser')
+    pieces = []
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, Comment):
+                continue
+            if isinstance(child, NavigableString):
+                pieces.append(str(child))
+                continue
+            name = (child.name or '').lower()
+            if name in DROP_TAGS:
+                continue
+            if name == 'br':
+                pieces.append(_LINE)
+                continue
+            block = name in BLOCK_TAGS
+            if block:
+                pieces.append(_PARA)
+            walk(child)
+            if block:
+                pieces.append(_PARA)
+
+    walk(soup)
+    return _assemble(''.join(pieces))
+
+
+def clean_html(markup: str) -> str:
+    """Return *markup* as plain text (memoized by content hash)."""
+    if not isinstance(markup, str) or ('<' not in markup and '&' not in markup):
+        return markup
+
+    key = hashlib.blake2b(markup.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    with _memo_lock:
+        cached = _memo.get(key)
+        if cached is not None:
+            _memo.move_to_end(key)
+            stats['hits'] += 1
+            return cached
+
+    markup_text = CONTROL_RE.sub('', markup)
+    text = _clean_fast(markup_text)
+    path = 'fast'
+    if text is None:
+        text = _clean_soup(markup_text)
+        path = 'fallback'
+
+    with _memo_lock:
+        stats[path] += 1
+        _memo[key] = text
+        if len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return text
@@ -0,0 +1,156 @@
+"""Pluggable LLM backends used by ``paper_reader_kernel.query_deepseek``.
+
+``OllamaHTTPBackend`` talks to the Ollama REST API over pooled keep-alive
+connections and streams tokens as they are generated.  ``SubprocessOllamaBackend``
+is the original ``ollama run`` path and serves as a fallback when the HTTP server
+is not reachable.
+"""
+import http.client
+import json
+import os
+import queue
+from typing import Callable, Dict, Optional, Union
+from urllib.parse import urlparse
+
+
+class LLMBackend:
+    """Interface: turn a full prompt into the model's complete text output."""
+
+    # Largest context the backend can give the model, or None if it applies ``options["num_ctx"]``
+    context_tokens: Optional[int] = None
+
+    def generate(self, prompt: str, model: str, options: Optional[Dict] = None,
+                 on_token: Optional[Callable[[str], None]] = None) -> str:
+        raise NotImplementedError
+
+
+class SubprocessOllamaBackend(LLMBackend):
+    """Run ``ollama run <model>`` once per query (no pooling, no streaming).
+
+    ``ollama run`` cannot pass model options, so ``num_ctx`` is not applied and
+    the model runs with the server's context length: *context_tokens*, by
+    default ``OLLAMA_CONTEXT_LENGTH`` or Ollama's default of 4096.
+    ``ask_deepseek`` budgets its prompts for it.
+    """
+
+    def __init__(self, executable: str = "ollama", timeout: Optional[float] = None,
+                 context_tokens: Optional[int] = None):
+        self.executable = executable
+        self.timeout = timeout
+        self.context_tokens = context_tokens or int(os.environ.get("OLLAMA_CONTEXT_LENGTH") or 4096)
+        self._warned = False
+
+    def generate(self, prompt, model, options=None, on_token=None):
+        import subprocess
+        if options and not self._warned:
+            # Warn once per backend rather than on every call
+            self._warned = True
+            print(f"[WARN] `ollama run` cannot apply options {sorted(options)}; "
+                  f"the model runs with a context of {self.context_tokens} tokens, longer prompts are truncated")
+        process = subprocess.run(
+            [self.executable, "run", model],
+            input=prompt,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=self.timeout,
+        )
+        if process.returncode != 0:
+            print(f"[ERROR] DeepSeek execution failed: {process.stderr}")
+            raise RuntimeError(f"DeepSeek execution failed:\n{process.stderr}")
+        if on_token:
+            on_token(process.stdout)
+        return process.stdout.strip()
+
+
+class OllamaHTTPBackend(LLMBackend):
+    """Stream completions from ``POST /api/generate`` over pooled connections.
+
+    Args:
+        base_url: Ollama server address.
+        timeout: Socket timeout in seconds for connect and for each streamed chunk.
+        keep_alive: How long Ollama keeps the model loaded after a request
+            (e.g. ``"30m"``; ``-1`` keeps it loaded indefinitely).
+        pool_size: Maximum number of idle keep-alive connections retained.
+        fallback: Backend used when the server cannot be reached.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", timeout: float = 600.0,
+                 keep_alive: Union[str, int] = "30m", pool_size: int = 4,
+                 fallback: Optional[LLMBackend] = None):
+        parts = urlparse(base_url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.fallback = fallback
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            conn_cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            return conn_cls(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn: http.client.HTTPConnection):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _post(self, path: str, payload: Dict):
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A pooled keep-alive connection was closed by the server; retry on a fresh one
+                conn.close()
+                if attempt:
+                    raise
+
+    def generate(self, prompt, model, options=None, on_token=None):
+        payload = {"model": model, "prompt": prompt, "stream": True, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        try:
+            conn, response = self._post("/api/generate", payload)
+        except ConnectionError as e:
+            if self.fallback is None:
+                raise
+            print(f"[WARN] Ollama HTTP API unavailable ({e}), falling back to {type(self.fallback).__name__}")
+            return self.fallback.generate(prompt, model, options=options, on_token=on_token)
+
+        try:
+            if response.status != 200:
+                detail = response.read().decode("utf-8", "replace")
+                print(f"[ERROR] DeepSeek execution failed: HTTP {response.status} {detail}")
+                raise RuntimeError(f"DeepSeek execution failed:\nHTTP {response.status} {detail}")
+
+            chunks = []
+            for line in response:
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if message.get("error"):
+                    print(f"[ERROR] DeepSeek execution failed: {message['error']}")
+                    raise RuntimeError(f"DeepSeek execution failed:\n{message['error']}")
+                token = message.get("response", "")
+                if token:
+                    chunks.append(token)
+                    if on_token:
+                        on_token(token)
+                if message.get("done"):
+                    break
+            # Drain the chunked terminator so the connection can be reused
+            response.read()
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn)
+        return "".join(chunks).strip()
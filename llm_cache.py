@@ -0,0 +1,99 @@
+"""Content-addressed, disk-backed cache of LLM responses.
+
+Responses are keyed by a hash of (model, prompt, content, sampling params) and
+stored in SQLite with a total size limit; the least recently used responses are
+evicted first.  Set ``LLM_CACHE_BYPASS=1`` (or ``cache.bypass = True``) to neither
+read nor write the cache.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+def make_key(model: str, prompt: str, content: str, params: Optional[Dict] = None) -> str:
+    """Return the SHA-256 hex digest identifying one LLM request."""
+    payload = json.dumps([model, prompt, content, params or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite LRU cache of LLM outputs with hit/miss counters.
+
+    The database is opened lazily on first use, so constructing a cache has no
+    side effects on disk.
+    """
+
+    def __init__(self, db_path: str = "./.llm_cache.sqlite3", max_bytes: int = 512 * 1024 * 1024,
+                 bypass: Optional[bool] = None):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.bypass = os.environ.get("LLM_CACHE_BYPASS", "") not in ("", "0") if bypass is None else bypass
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT,"
+                " size INTEGER,"
+                " last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for *key* (refreshing its LRU position), or None."""
+        if self.bypass:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store *response* under *key* and evict least recently used entries over the size limit."""
+        if self.bypass:
+            return
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_size in conn.execute(
+                        "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= old_size
+            conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+            self._conn.commit()
@@ -0,0 +1,201 @@
+"""Per-run tracing for the feeder jobs, exported as JSON and a Prometheus textfile.
+
+Recording is off unless ``FEEDER_METRICS=1`` is set (or ``metrics.ENABLED`` is
+set to True).  Call sites check ``metrics.ENABLED`` before doing any timing
+work, like the ``DEBUG`` switch, so a disabled recorder costs one attribute
+lookup per call site.
+
+Events are plain dicts with a ``kind``:
+
+* ``stage``: one pipeline stage for one feed (``stage``, ``feed``, ``seconds``, ``ok``).
+* ``pdf``: one rendered file (``pdf``, ``backend``, ``status``, ``seconds``).
+* ``llm``: one model call (``model``, ``step``, ``prompt_chars``, ``prompt_tokens``,
+  ``output_chars``, ``output_tokens``, ``seconds``, ``first_token_seconds``,
+  ``tokens_per_second``, ``cached``).
+
+``write_run`` saves them with per-stage and per-step totals to
+``metrics_<job>_<timestamp>.json`` and overwrites ``<job>.prom`` for the
+node_exporter textfile collector.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+ENABLED = os.environ.get("FEEDER_METRICS", "") not in ("", "0")
+
+# Directory of the Prometheus textfile; defaults to the run's own output directory
+PROMETHEUS_DIR = os.environ.get("FEEDER_METRICS_PROM_DIR")
+
+
+class Recorder:
+    """Thread-safe event log for one feeder run."""
+
+    def __init__(self, job: str = "feeder"):
+        self.job = job
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, **fields):
+        fields["kind"] = kind
+        fields["at"] = time.perf_counter() - self._start
+        with self._lock:
+            self.events.append(fields)
+
+    def summary(self) -> Dict:
+        """Totals per pipeline stage, per LLM step kind and model, and per PDF backend."""
+        stages: Dict[str, Dict] = {}
+        llm: Dict[Tuple[str, str], Dict] = {}
+        pdf: Dict[str, Dict] = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            if event["kind"] == "stage":
+                total = stages.setdefault(event["stage"], {"count": 0, "failed": 0, "seconds": 0.0})
+                total["failed"] += 0 if event["ok"] else 1
+            elif event["kind"] == "llm":
+                total = llm.setdefault((step_kind(event["step"]), event["model"]), {
+                    "count": 0, "cached": 0, "seconds": 0.0, "prompt_tokens": 0, "output_tokens": 0})
+                total["cached"] += 1 if event["cached"] else 0
+                total["prompt_tokens"] += event["prompt_tokens"]
+                total["output_tokens"] += event["output_tokens"]
+            elif event["kind"] == "pdf":
+                total = pdf.setdefault(event["backend"], {"count": 0, "skipped": 0, "failed": 0, "seconds": 0.0})
+                total["skipped"] += 1 if event["status"] == "skipped" else 0
+                total["failed"] += 1 if event["status"] == "failed" else 0
+            else:
+                continue
+            total["count"] += 1
+            total["seconds"] += event["seconds"]
+        return {
+            "stages": stages,
+            "llm": [dict(step=step, model=model, **total) for (step, model), total in sorted(llm.items())],
+            "pdf": pdf,
+        }
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            events = list(self.events)
+        return {
+            "job": self.job,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "seconds": time.perf_counter() - self._start,
+            "summary": self.summary(),
+            "events": events,
+        }
+
+    def prometheus(self) -> str:
+        """Render the run's totals in the Prometheus text exposition format."""
+        data = self.to_dict()
+        job = {"job": self.job}
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples: List[Tuple[Dict, float]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(dict(job, **labels))} {float(value)!r}")
+
+        stages = data["summary"]["stages"]
+        metric("feeder_run_seconds", "Wall-clock duration of the last run.", [({}, data["seconds"])])
+        metric("feeder_run_timestamp_seconds", "Start time of the last run.", [({}, self.started)])
+        metric("feeder_stage_seconds", "Seconds spent in each pipeline stage, summed over feeds.",
+               [({"stage": stage}, total["seconds"]) for stage, total in stages.items()])
+        metric("feeder_stage_items", "Feeds processed by each pipeline stage.",
+               [({"stage": stage}, total["count"]) for stage, total in stages.items()])
+        metric("feeder_stage_failures", "Feeds that failed in each pipeline stage.",
+               [({"stage": stage}, total["failed"]) for stage, total in stages.items()])
+        metric("feeder_feed_stage_seconds", "Seconds spent on one feed in one pipeline stage.",
+               [({"stage": e["stage"], "feed": e["feed"]}, e["seconds"])
+                for e in data["events"] if e["kind"] == "stage"])
+
+        llm = data["summary"]["llm"]
+        labels = [{"step": total["step"], "model": total["model"]} for total in llm]
+        metric("feeder_llm_calls", "LLM calls by step kind and model.",
+               [(label, total["count"]) for label, total in zip(labels, llm)])
+        metric("feeder_llm_cache_hits", "LLM calls answered from the response cache.",
+               [(label, total["cached"]) for label, total in zip(labels, llm)])
+        metric("feeder_llm_seconds", "Seconds spent waiting for the LLM.",
+               [(label, total["seconds"]) for label, total in zip(labels, llm)])
+        metric("feeder_llm_prompt_tokens", "Estimated prompt tokens sent to the LLM.",
+               [(label, total["prompt_tokens"]) for label, total in zip(labels, llm)])
+        metric("feeder_llm_output_tokens", "Estimated tokens generated by the LLM.",
+               [(label, total["output_tokens"]) for label, total in zip(labels, llm)])
+
+        pdf = data["summary"]["pdf"]
+        metric("feeder_pdf_seconds", "Seconds spent rendering PDFs.",
+               [({"backend": backend}, total["seconds"]) for backend, total in pdf.items()])
+        metric("feeder_pdf_files", "PDF files handled, including skipped ones.",
+               [({"backend": backend}, total["count"]) for backend, total in pdf.items()])
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def step_kind(step: Optional[str]) -> str:
+    """``'iteration:2'`` -> ``'iteration'``; unlabeled calls are ``'query'``."""
+    return (step or "query").split(":", 1)[0]
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+RECORDER = Recorder()
+
+
+def start_run(job: str) -> Recorder:
+    """Begin a new run; later events are recorded under *job*."""
+    global RECORDER
+    RECORDER = Recorder(job)
+    return RECORDER
+
+
+def record(kind: str, **fields):
+    """Add an event to the current run (callers check ``ENABLED`` first)."""
+    RECORDER.record(kind, **fields)
+
+
+def record_llm(model: str, step: Optional[str], prompt: str, output: str, seconds: float,
+               first_token_seconds: Optional[float] = None, cached: bool = False,
+               count_tokens: Callable[[str], int] = lambda text: len(text) // 4 + 1):
+    """Record one LLM call; *count_tokens* estimates token counts from the text."""
+    prompt_tokens = count_tokens(prompt)
+    output_tokens = count_tokens(output)
+    generating = seconds - (first_token_seconds or 0.0)
+    RECORDER.record(
+        "llm", model=model, step=step or "query", cached=cached,
+        prompt_chars=len(prompt), prompt_tokens=prompt_tokens,
+        output_chars=len(output), output_tokens=output_tokens,
+        seconds=seconds, first_token_seconds=first_token_seconds,
+        tokens_per_second=output_tokens / generating if generating > 0 and not cached else None,
+    )
+
+
+def write_run(directory: str) -> Optional[Tuple[str, str]]:
+    """Write the current run to JSON and Prometheus files; returns their paths (None when disabled)."""
+    if not ENABLED:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    recorder = RECORDER
+    stamp = datetime.fromtimestamp(recorder.started).strftime("%Y%m%d_%H%M%S")
+    json_path = os.path.join(directory, f"metrics_{recorder.job}_{stamp}.json")
+    _write_atomic(json_path, json.dumps(recorder.to_dict(), indent=1, ensure_ascii=False))
+
+    prom_dir = PROMETHEUS_DIR or directory
+    os.makedirs(prom_dir, exist_ok=True)
+    prom_path = os.path.join(prom_dir, f"{recorder.job}.prom")
+    _write_atomic(prom_path, recorder.prometheus())
+    print(f"✅ Metrics saved: {json_path}, {prom_path}")
+    return json_path, prom_path
@@ -1,13 +1,39 @@
 from universal_rss_fetcher2 import UniversalRSSFetcher
+from feed_cache import FeedCache
+from seen_index import SeenIndex
+from pipeline import Pipeline, make_feed_stages
+from archive import Archive
+from scheduler import Scheduler, feed_result
+from checkpoints import CheckpointStore
+import metrics
 import datetime
 from paper_reader_kernel import ask_deepseek
 import time
-import schedule
-from typing import Dict, List
+from typing import Dict, List, Optional
 import os
 
 # Constants
 ITERATION_NUM = 3
+# Stop sampling once finished iterations reach this token-set similarity (None disables)
+EARLY_STOP_SIMILARITY = None
+# Model context window; larger sources are summarized in map-reduce batches
+CONTEXT_TOKENS = 32768
+FETCH_WORKERS = 8
+PDF_WORKERS = 2
+FEED_CACHE_DIR = './news_feeds/.feed_cache'
+SEEN_INDEX_PATH = './news_feeds/seen_entries.sqlite3'
+# Entries of different sources at or above this estimated similarity are one story, summarized once
+STORY_SIMILARITY = 0.5
+STORY_INDEX_PATH = './news_feeds/story_index.sqlite3'
+# Searchable record of every entry and summary (python archive.py --db ... search/export)
+ARCHIVE_PATH = './news_feeds/archive.sqlite3'
+# Each source is polled on its own interval, adapted to how often it publishes (and its RSS ttl)
+POLL_INITIAL_INTERVAL = 3600
+POLL_MIN_INTERVAL = 15 * 60
+POLL_MAX_INTERVAL = 12 * 3600
+SCHEDULER_STATE_PATH = './news_feeds/scheduler_state.json'
+# Every finished LLM call is saved here; unfinished runs are resumed at startup and before each job
+CHECKPOINT_PATH = './news_feeds/checkpoints.sqlite3'
 PROMPT_SUMMARY = """You are a professional financial news analyst and article summarizer. Please analyze and summarize the main content of the article, focusing on:
                     1. Market trends and changes in key economic indicators
                     2. Major corporate events and strategic adjustments
@@ -40,7 +66,8 @@ NEWS_SOURCES = {
 }
 def process_news_source(source_name: str, url: str) -> Dict[str, str]:
     """Process a single news source and return file paths"""
-    date_str = datetime.date.today().strftime('%Y%m%d')
+    # Sources can be polled several times a day, so file names carry the poll time
+    date_str = datetime.datetime.now().strftime('%Y%m%d_%H%M')
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H')
     feed_dir = f'./news_feeds/feeds_{timestamp}'
 
@@ -52,39 +79,116 @@ def process_news_source(source_name: str, url: str) -> Dict[str, str]:
         'summary_pdf': f"{feed_dir}/news_{source_name}_{date_str}_summary.pdf"
     }
 
-def job(summarize=True):
+# Generate summary
+def summarize_item(item):
+    # The pipeline archives the summary and writes its Markdown file from the archive
+    return ask_deepseek(
+        PROMPT_SUMMARY,
+        item['text'],
+        None,
+        None,
+        iteration_num=ITERATION_NUM,
+        early_stop_similarity=EARLY_STOP_SIMILARITY,
+        context_tokens=CONTEXT_TOKENS,
+        llm_model="deepseek-r1:latest",
+        llm_model_merge="deepseek-r1:70b",
+        render_pdf=False,
+        checkpoint=item.get('checkpoint'),
+    )
+
+def job(summarize=True, sources: Optional[List[str]] = None):
+    """Fetch, cluster and summarize *sources* (default: all); returns ``{source: poll result}``."""
+    if summarize:
+        # Retry the sources of earlier runs whose summary failed or was interrupted
+        resume()
     start_time = time.time()
-    fetcher = UniversalRSSFetcher()
-
-    for source_name, url in NEWS_SOURCES.items():
-        files = process_news_source(source_name, url)
-        
-        # Fetch and process news
-        result = fetcher.fetch_universal_rss(
-            url,
-            source_type="news",
-            md_file=files['raw_md']
-        )
-
-        # # Generate summary
-        if summarize:
-            ask_deepseek(
-                PROMPT_SUMMARY,
-                result,
-                files['summary_md'],
-                files['summary_pdf'],
-                iteration_num=ITERATION_NUM,
-                llm_model="deepseek-r1:latest",
-                llm_model_merge="deepseek-r1:70b"
-            )
+    os.makedirs('./news_feeds', exist_ok=True)
+    metrics.start_run('news_feeder')
+    # Entries only count as seen once their summary is written (in the llm stage); fetch-only runs
+    # and failed summaries leave them for a later job
+    fetcher = UniversalRSSFetcher(cache=FeedCache(FEED_CACHE_DIR), seen_index=SeenIndex(SEEN_INDEX_PATH))
+
+    run = datetime.datetime.now().strftime('%Y%m%d_%H%M')
+    items = [
+        dict(process_news_source(source_name, url), category=source_name, url=url, source_type="news", run=run)
+        for source_name, url in NEWS_SOURCES.items()
+        if sources is None or source_name in sources
+    ]
+
+    checkpoints = CheckpointStore(CHECKPOINT_PATH).run('news_feeder', run)
+    archive = Archive(ARCHIVE_PATH)
+    # Fetch, parse and write the raw Markdown of all sources first: clustering needs every source.
+    # Nothing is checkpointed yet, since clustering decides what each source summarizes
+    gather = Pipeline(make_feed_stages(fetcher, fetch_workers=FETCH_WORKERS, archive=archive)[:3])
+    done = {item['category']: item for item in gather.run(items)}
+    gather.report()
+
+    # Group near-duplicate stories across sources (and earlier runs); each new story is
+    # summarized once, by the first source that reported it, with all its sources listed
+    from story_clusters import StoryClusterer, StoryIndex, stories_by_source
+    clusterer = StoryClusterer(threshold=STORY_SIMILARITY, index=StoryIndex(STORY_INDEX_PATH))
+    stories = clusterer.cluster({name: done[name]['entries'] for name in NEWS_SOURCES if name in done})
+    owned = stories_by_source(stories)
+    for name, item in done.items():
+        item['text'] = fetcher.render_entries([story.to_entry() for story in owned.get(name, [])])
+        if summarize and item['text']:
+            # Checkpoint the clustered text, which is what gets summarized
+            item['checkpoint'] = checkpoints.begin(item)
+    print(f"Clustered {sum(len(item['entries']) for item in done.values())} entries into {len(stories)} stories "
+          f"({sum(story.repeat for story in stories)} already covered in earlier runs)")
+
+    # Then summarize and render the sources as overlapping pipeline stages
+    finish = Pipeline(make_feed_stages(
+        None,
+        summarize_item if summarize else None,
+        pdf_workers=PDF_WORKERS,
+        archive=archive,
+        checkpoints=checkpoints,
+        seen_index=fetcher.seen_index,
+    )[3:])
+    finish.run(done.values())
+    finish.report()
+    if summarize:
+        # Only stories that were summarized (and earlier ones seen again) count as covered;
+        # stories of fetch-only runs and failed LLM calls are summarized by a later run
+        clusterer.record(story for story in stories
+                         if story.repeat or done[story.sources[0]].get('summarized'))
 
     execution_time = time.time() - start_time
     print(f"News processing completed in {execution_time:.2f} seconds")
+    # Per-stage and per-LLM-call timings (only when FEEDER_METRICS=1)
+    metrics.write_run('./news_feeds')
+    return {name: feed_result(item) for name, item in done.items()}
+
+def resume():
+    """Finish the summaries of every interrupted or failed run from its checkpoints; returns how many were left."""
+    store = CheckpointStore(CHECKPOINT_PATH)
+    left = 0
+    for run, items in store.pending('news_feeder'):
+        print(f"Resuming interrupted run {run}: {len(items)} sources left")
+        metrics.start_run('news_feeder')
+        pipeline = Pipeline(make_feed_stages(
+            None,
+            summarize_item,
+            pdf_workers=PDF_WORKERS,
+            archive=Archive(ARCHIVE_PATH),
+            checkpoints=store.run('news_feeder', run),
+            seen_index=SeenIndex(SEEN_INDEX_PATH),
+        )[3:])
+        pipeline.run(items)
+        pipeline.report()
+        metrics.write_run('./news_feeds')
+        left += len(items)
+    return left
+
+def main():
+    resume()
+    scheduler = Scheduler(state_path=SCHEDULER_STATE_PATH)
+    scheduler.add_feeds('news_feeder', NEWS_SOURCES, lambda due: job(sources=due),
+                        initial_interval=POLL_INITIAL_INTERVAL, min_interval=POLL_MIN_INTERVAL,
+                        max_interval=POLL_MAX_INTERVAL)
+    scheduler.run()
 
-job()
-schedule.every().day.at("03:00").do(job)
-# schedule.every().day.at("20:15").do(job)
+if __name__ == '__main__':
+    main()
 
-while True:
-    schedule.run_pending()
-    time.sleep(1)
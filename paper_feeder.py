@@ -1,12 +1,17 @@
 import os
-import schedule
-import time
 # from fetch_pubmed_rss import fetch_pubmed_rss
 # from fetch_arxiv_rss import fetch_arxiv_rss
 from paper_reader_kernel import ask_deepseek
 from datetime import datetime
 from universal_rss_fetcher2 import UniversalRSSFetcher, fetch_rss_universal
-from paper_reader_kernel import run_shell_command
+from feed_cache import FeedCache
+from seen_index import SeenIndex
+from pipeline import Pipeline, make_feed_stages
+from pdf_renderer import render_batch
+from archive import Archive
+from scheduler import Scheduler, feed_result
+from checkpoints import CheckpointStore
+import metrics
 
 """Automated RSS feeder for arXiv and PubMed.
 
@@ -16,73 +21,163 @@ and asks an LLM to create concise summaries.
 
 PROMPT_SUMMARY = 'For each article, keep the full title, write a 1-2 sentence summary focusing on objective, method, and key findings, and clearly indicate whether the study appears to be high-impact based on novelty or significance.'
 ITERATION_NUM = 3
+# Stop sampling once finished iterations reach this token-set similarity (None disables)
+EARLY_STOP_SIMILARITY = None
+# Model context window; larger categories are summarized in map-reduce batches
+CONTEXT_TOKENS = 32768
+FETCH_WORKERS = 4
+PDF_WORKERS = 2
+FEED_CACHE_DIR = './feed_folder/.feed_cache'
+SEEN_INDEX_PATH = './feed_folder/seen_entries.sqlite3'
+# Only entries matching this interest profile are summarized (all stay in the raw Markdown);
+# e.g. 'large language models reasoning retrieval medical imaging'. Empty disables the filter.
+INTEREST_PROFILE = ''
+RELEVANCE_TOP_K = 40
+# None keeps every entry matching at least one profile term (up to RELEVANCE_TOP_K)
+RELEVANCE_THRESHOLD = None
+RELEVANCE_STATS_PATH = './feed_folder/relevance_stats.npz'
+# Searchable record of every entry and summary (python archive.py --db ... search/export)
+ARCHIVE_PATH = './feed_folder/archive.sqlite3'
+# Each category is polled on its own interval, adapted to how often it has new papers
+POLL_INITIAL_INTERVAL = 12 * 3600
+POLL_MIN_INTERVAL = 3600
+POLL_MAX_INTERVAL = 24 * 3600
+SCHEDULER_STATE_PATH = './feed_folder/scheduler_state.json'
+# Every finished LLM call is saved here; unfinished runs are resumed at startup and before each job
+CHECKPOINT_PATH = './feed_folder/checkpoints.sqlite3'
 
-def job(summarize=True):
+# arxiv
+ARXIV_CATEGORIES = {
+    'cs.AI': 'https://export.arxiv.org/rss/cs.AI',  # 人工智能
+    'cs.LG': 'https://export.arxiv.org/rss/cs.LG',  # 机器学习
+    'cs.CV': 'https://export.arxiv.org/rss/cs.CV',  # 计算机视觉
+    'cs.CL': 'https://export.arxiv.org/rss/cs.CL',  # 计算语言学
+    # 'cs.IR': 'https://export.arxiv.org/rss/cs.IR',  # 信息检索
+    'stat.ML': 'https://export.arxiv.org/rss/stat.ML',  # 统计机器学习
+    # 'q-bio.QM': 'https://export.arxiv.org/rss/q-bio.QM',  # 定量方法
+    # 'physics.med-ph': 'https://export.arxiv.org/rss/physics.med-ph'  # 医学物理
+}
 
-    timestamp = datetime.now().strftime('%Y%m%d_%H')
-    feed_dir = f'./feed_folder/feeds_{timestamp}'
-    os.makedirs(feed_dir, exist_ok=True)
-
-    fetcher = UniversalRSSFetcher()
-    ###############################################
-    # First fetch all RSS feeds
-    fetch_results = []
-
-    # arxiv
-    arxiv_categories = {
-        'cs.AI': 'https://export.arxiv.org/rss/cs.AI',  # 人工智能
-        'cs.LG': 'https://export.arxiv.org/rss/cs.LG',  # 机器学习
-        'cs.CV': 'https://export.arxiv.org/rss/cs.CV',  # 计算机视觉
-        'cs.CL': 'https://export.arxiv.org/rss/cs.CL',  # 计算语言学
-        # 'cs.IR': 'https://export.arxiv.org/rss/cs.IR',  # 信息检索
-        'stat.ML': 'https://export.arxiv.org/rss/stat.ML',  # 统计机器学习
-        # 'q-bio.QM': 'https://export.arxiv.org/rss/q-bio.QM',  # 定量方法
-        # 'physics.med-ph': 'https://export.arxiv.org/rss/physics.med-ph'  # 医学物理
-    }
-    for category, url in arxiv_categories.items():
-        original_md = f"{feed_dir}/arxiv_org{category}_{timestamp}.md"
-        original_pdf = f"{feed_dir}/arxiv_org{category}_{timestamp}.pdf"
-        summary_md = f"{feed_dir}/arxiv_summary{category}_{timestamp}.md"
-        summary_pdf = summary_md.replace('.md', '.pdf')
-
-        print(f"\n正在抓取 arXiv {category} 类别...")
-        result = fetcher.fetch_universal_rss(
-            url,
-            source_type="arxiv",
-            md_file=original_md
-        )
-        print(f"arXiv {category} RSS抓取完成，共{len(result.split('['))-1}篇论文")
-        fetch_results.append((result, original_md, original_pdf, summary_md, summary_pdf))
+def summarize_item(item):
+    if 'entries' in item:
+        print(f"arXiv {item['category']} RSS抓取完成，共{len(item['entries'])}篇论文")
+    # The pipeline archives the summary and writes its Markdown file from the archive
+    return ask_deepseek(
+        PROMPT_SUMMARY,
+        item['text'],
+        None,
+        None,
+        iteration_num=ITERATION_NUM,
+        early_stop_similarity=EARLY_STOP_SIMILARITY,
+        context_tokens=CONTEXT_TOKENS,
+        render_pdf=False,
+        checkpoint=item.get('checkpoint'),
+    )
 
-    ##############################################
-    # First combine all markdown content into one file
+def write_merged(feed_dir, timestamp, items):
+    """Combine the fetched content of *items* into one Markdown file and render it."""
     merged_md = f"{feed_dir}/arxiv_merged_{timestamp}.md"
     with open(merged_md, 'w', encoding='utf-8') as f:
-        for result, _, _, _, _ in fetch_results:
-            f.write(result + "\n\n")
+        for item in items:
+            f.write(item['raw_text'] + "\n\n")
     
     # Convert combined markdown to PDF
     merged_pdf = f"{feed_dir}/arxiv_merged_{timestamp}.pdf"
-    run_shell_command("md2pdf", merged_md, merged_pdf)
-    ##############################################
-    
-    #############################################
-    # Then process all results with deepseek if summarize is enabled
+    render_batch([(merged_md, merged_pdf)])
+
+def job(summarize=True, categories=None):
+    """Fetch and summarize *categories* (default: all); returns ``{category: poll result}``."""
     if summarize:
-        for result, _, _, summary_md, summary_pdf in fetch_results:
-            ask_deepseek(
-                PROMPT_SUMMARY,
-                result,
-                summary_md,
-                summary_pdf,
-                iteration_num=ITERATION_NUM,
-            )
-    #############################################
-
-# job()
-# schedule.every().day.at("08:15").do(job)
-schedule.every().day.at("23:00").do(job)
-
-while True:
-    schedule.run_pending()
-    time.sleep(1)
\ No newline at end of file
+        # Retry the categories of earlier runs whose summary failed or was interrupted
+        resume()
+
+    # Categories can be polled more than once an hour, so file names and the run carry the poll minute
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+    feed_dir = f'./feed_folder/feeds_{timestamp[:11]}'
+    os.makedirs(feed_dir, exist_ok=True)
+    metrics.start_run('paper_feeder')
+
+    # Entries only count as seen once their summary is written (in the llm stage); fetch-only runs
+    # and failed summaries leave them for a later job
+    fetcher = UniversalRSSFetcher(cache=FeedCache(FEED_CACHE_DIR), seen_index=SeenIndex(SEEN_INDEX_PATH))
+    relevance = None
+    if INTEREST_PROFILE:
+        # NumPy is only loaded when the filter is enabled
+        from relevance import RelevanceFilter
+        relevance = RelevanceFilter(INTEREST_PROFILE, RELEVANCE_STATS_PATH, top_k=RELEVANCE_TOP_K,
+                                    threshold=RELEVANCE_THRESHOLD)
+
+    items = []
+    for category, url in ARXIV_CATEGORIES.items():
+        if categories is not None and category not in categories:
+            continue
+        summary_md = f"{feed_dir}/arxiv_summary{category}_{timestamp}.md"
+        items.append({
+            'category': category,
+            'url': url,
+            'source_type': 'arxiv',
+            'run': timestamp,
+            'raw_md': f"{feed_dir}/arxiv_org{category}_{timestamp}.md",
+            'summary_md': summary_md,
+            'summary_pdf': summary_md.replace('.md', '.pdf'),
+        })
+
+    ###############################################
+    # Fetch, parse, write, summarize and render every category as overlapping pipeline stages
+    print(f"\n正在抓取 arXiv {len(items)} 个类别...")
+    pipeline = Pipeline(make_feed_stages(
+        fetcher,
+        summarize_item if summarize else None,
+        fetch_workers=FETCH_WORKERS,
+        pdf_workers=PDF_WORKERS,
+        relevance=relevance,
+        archive=Archive(ARCHIVE_PATH),
+        checkpoints=CheckpointStore(CHECKPOINT_PATH).run('paper_feeder', timestamp),
+    ))
+    done = {item['url']: item for item in pipeline.run(items)}
+    pipeline.report()
+
+    ##############################################
+    # Then combine all fetched content into one file, in category order
+    write_merged(feed_dir, timestamp, [done[item['url']] for item in items if item['url'] in done])
+    ##############################################
+
+    # Per-stage and per-LLM-call timings (only when FEEDER_METRICS=1)
+    metrics.write_run(feed_dir)
+    return {item['category']: feed_result(item) for item in done.values()}
+
+def resume():
+    """Finish the summaries of every interrupted or failed run from its checkpoints; returns how many were left."""
+    store = CheckpointStore(CHECKPOINT_PATH)
+    left = 0
+    for timestamp, items in store.pending('paper_feeder'):
+        feed_dir = f'./feed_folder/feeds_{timestamp[:11]}'
+        print(f"\n继续中断的运行 {timestamp}: 剩余 {len(items)} 个类别")
+        metrics.start_run('paper_feeder')
+        pipeline = Pipeline(make_feed_stages(
+            None,
+            summarize_item,
+            pdf_workers=PDF_WORKERS,
+            archive=Archive(ARCHIVE_PATH),
+            checkpoints=store.run('paper_feeder', timestamp),
+            seen_index=SeenIndex(SEEN_INDEX_PATH),
+        )[3:])
+        pipeline.run(items)
+        pipeline.report()
+        # The run may have stopped before its merged file was written
+        if not os.path.exists(f"{feed_dir}/arxiv_merged_{timestamp}.md"):
+            write_merged(feed_dir, timestamp, store.items('paper_feeder', timestamp))
+        metrics.write_run(feed_dir)
+        left += len(items)
+    return left
+
+def main():
+    resume()
+    scheduler = Scheduler(state_path=SCHEDULER_STATE_PATH)
+    scheduler.add_feeds('paper_feeder', ARXIV_CATEGORIES, lambda due: job(categories=due),
+                        initial_interval=POLL_INITIAL_INTERVAL, min_interval=POLL_MIN_INTERVAL,
+                        max_interval=POLL_MAX_INTERVAL)
+    scheduler.run()
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,124 @@
 DEBUG = False  # Set to True to enable debug printouts
 
-"""Utility helpers for reading scientific papers, querying the DeepSeek model, and exporting markdown/PDF summaries."""
-import fitz
-import subprocess
+"""Utility helpers for reading scientific papers, querying the DeepSeek model, and exporting markdown/PDF summaries.
+
+PyMuPDF (``fitz``), process pools and ``subprocess`` are imported by the functions
+that need them, so importing this module for LLM calls stays cheap.
+"""
 import os
-from fpdf import FPDF
-import textwrap
 import re
 import shlex
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from llm_backends import LLMBackend, OllamaHTTPBackend, SubprocessOllamaBackend
+from llm_cache import LLMResponseCache, make_key
+from pdf_renderer import render_batch
+import metrics
+
+# Default LLM backend: Ollama REST API with the `ollama run` subprocess as fallback
+LLM_BACKEND = OllamaHTTPBackend(fallback=SubprocessOllamaBackend())
+
+def set_llm_backend(backend: LLMBackend):
+    """Replace the backend used by :func:`query_deepseek` when none is passed."""
+    global LLM_BACKEND
+    LLM_BACKEND = backend
+
+# Default LLM response cache (opened lazily); None disables caching
+LLM_CACHE = LLMResponseCache()
+
+def set_llm_cache(cache):
+    """Replace the response cache used by :func:`query_deepseek` (None disables it)."""
+    global LLM_CACHE
+    LLM_CACHE = cache
+
+# Directory for extracted PDF text keyed by file content hash; None disables the cache
+PDF_TEXT_CACHE_DIR = "./.pdf_text_cache"
+# Page count from which extraction is split across worker processes
+PDF_PARALLEL_MIN_PAGES = 40
+
+# Stream the text of a PDF page by page, up to max_pages
+
+def iter_pdf_text(pdf_path, max_pages=50, start_page=0):
+    """Yield the text of pages ``start_page .. max_pages-1`` of *pdf_path*, one page at a time."""
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start_page, min(len(doc), max_pages)):
+            yield doc[page_num].get_text()
+
+def _extract_page_range(args):
+    pdf_path, start_page, end_page = args
+    return "".join(iter_pdf_text(pdf_path, max_pages=end_page, start_page=start_page))
+
+def _pdf_text_cache_path(pdf_path, max_pages):
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return os.path.join(PDF_TEXT_CACHE_DIR, f"{digest.hexdigest()}_{max_pages}.txt")
 
 # Extract text from a PDF file, up to max_pages
 # Debug: Print PDF path and page count
 
-def extract_text_from_pdf(pdf_path, max_pages=50):
-    """Return concatenated text from the first *max_pages* pages of *pdf_path*."""
+def extract_text_from_pdf(pdf_path, max_pages=50, workers=None):
+    """Return concatenated text from the first *max_pages* pages of *pdf_path*.
+
+    Results are cached by file content hash in ``PDF_TEXT_CACHE_DIR``.  Documents
+    with at least ``PDF_PARALLEL_MIN_PAGES`` pages are split into page ranges
+    across *workers* processes.
+    """
     if DEBUG:
         print(f"[DEBUG] Extracting text from: {pdf_path}, max_pages={max_pages}")
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page_num in range(min(len(doc), max_pages)):
-        page = doc[page_num]
-        text += page.get_text()
+    cache_path = _pdf_text_cache_path(pdf_path, max_pages) if PDF_TEXT_CACHE_DIR else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        if DEBUG:
+            print(f"[DEBUG] PDF text cache hit: {cache_path}")
+        return text
+
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        page_count = min(len(doc), max_pages)
+    workers = workers or os.cpu_count() or 1
+    if page_count >= PDF_PARALLEL_MIN_PAGES and workers > 1:
+        step = -(-page_count // workers)
+        ranges = [(pdf_path, start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            text = "".join(executor.map(_extract_page_range, ranges))
+    else:
+        text = "".join(iter_pdf_text(pdf_path, max_pages=max_pages))
+
+    if cache_path:
+        os.makedirs(PDF_TEXT_CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(text)
     if DEBUG:
         print(f"[DEBUG] Extracted {len(text)} characters from PDF.")
     return text
 
+# Stream PDF text as prompt-sized chunks of at most max_tokens estimated tokens
+
+def iter_pdf_text_chunks(pdf_path, max_tokens, max_pages=50):
+    chunk, chunk_tokens = [], 0
+    for page_text in iter_pdf_text(pdf_path, max_pages=max_pages):
+        for paragraph in re.split(r"(?<=\n)\n", page_text):
+            paragraph_tokens = estimate_tokens(paragraph)
+            if chunk and chunk_tokens + paragraph_tokens > max_tokens:
+                yield "".join(chunk)
+                chunk, chunk_tokens = [], 0
+            if paragraph_tokens > max_tokens:
+                # Split a paragraph that alone exceeds the budget on line and word boundaries
+                *heads, paragraph = split_to_tokens(paragraph, max_tokens, ("\n", " "))
+                yield from heads
+                paragraph_tokens = estimate_tokens(paragraph)
+            chunk.append(paragraph)
+            chunk_tokens += paragraph_tokens
+    if chunk:
+        yield "".join(chunk)
+
 # Extract text after </think> tag from LLM output
 def extract_post_think_text(full_text):
     if DEBUG:
@@ -32,30 +126,71 @@ def extract_post_think_text(full_text):
     parts = full_text.split("</think>")
     return parts[1].strip() if len(parts) > 1 else full_text
 
-# Query DeepSeek model via Ollama subprocess
+# Query DeepSeek model via the configured LLM backend, reusing cached responses
+# *step* names the call in metrics, e.g. "iteration:1", "map:3" or "merge"
+# With a *checkpoint* (checkpoints.Checkpoint) the output of the step is saved as soon as it returns and replayed on resume
 # Debug: Print prompt length and context lengthS
-def query_deepseek(prompt_text, context_text, llm_model="deepseek-r1:70b"):
+def query_deepseek(prompt_text, context_text, llm_model="deepseek-r1:70b", backend=None, on_token=None, options=None, sample_idx=0, use_cache=True, step=None, checkpoint=None):
     if DEBUG:
         print(f"[DEBUG] Querying DeepSeek: prompt length={len(prompt_text)}, context length={len(context_text)}")
+    if metrics.ENABLED:
+        start = time.perf_counter()
     full_prompt = f"{prompt_text}\n\nHere is the content:\n{context_text}"
-    process = subprocess.run(
-        ["ollama", "run", llm_model],  
-        input=full_prompt,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    if process.returncode != 0:
-        print(f"[ERROR] DeepSeek execution failed: {process.stderr}")
-        raise RuntimeError(f"DeepSeek execution failed:\n{process.stderr}")
+    # sample_idx keeps self-consistency samples of the same input distinct
+    key = make_key(llm_model, prompt_text, context_text, {"options": options, "sample": sample_idx})
+    checkpoint = checkpoint if step else None
+    if checkpoint is not None:
+        output = checkpoint.get(step, key)
+        if output is not None:
+            if DEBUG:
+                print(f"[DEBUG] DeepSeek step {step} restored from checkpoint")
+            if on_token:
+                on_token(output)
+            if metrics.ENABLED:
+                metrics.record_llm(llm_model, step, full_prompt, output, time.perf_counter() - start,
+                                   cached=True, count_tokens=estimate_tokens)
+            return output
+    cache = LLM_CACHE if use_cache else None
+    if cache is not None:
+        output = cache.get(key)
+        if output is not None:
+            if DEBUG:
+                print(f"[DEBUG] DeepSeek cache hit: {cache.stats()}")
+            if on_token:
+                on_token(output)
+            if metrics.ENABLED:
+                metrics.record_llm(llm_model, step, full_prompt, output, time.perf_counter() - start,
+                                   cached=True, count_tokens=estimate_tokens)
+            if checkpoint is not None:
+                checkpoint.put(step, key, output)
+            return output
+    if metrics.ENABLED:
+        # Time to first token separates model loading and prompt evaluation from generation
+        first_token = []
+        user_on_token = on_token
+
+        def on_token(token):
+            if not first_token:
+                first_token.append(time.perf_counter() - start)
+            if user_on_token:
+                user_on_token(token)
+    output = (backend or LLM_BACKEND).generate(full_prompt, llm_model, options=options, on_token=on_token)
+    if metrics.ENABLED:
+        metrics.record_llm(llm_model, step, full_prompt, output, time.perf_counter() - start,
+                           first_token_seconds=first_token[0] if first_token else None, count_tokens=estimate_tokens)
+    if cache is not None:
+        cache.put(key, output)
+    if checkpoint is not None:
+        checkpoint.put(step, key, output)
     if DEBUG:
-        print(f"[DEBUG] DeepSeek output length: {len(process.stdout.strip())}")
-    return process.stdout.strip()
+        print(f"[DEBUG] DeepSeek output length: {len(output)}")
+    return output
 
 # Safely run shell commands with arguments
 
 def run_shell_command(command, *args):
     """Safely run *command* with each argument shell-escaped."""
+    import subprocess
     safe_args = [shlex.quote(arg) for arg in args]
     cmd_str = f"{command} {' '.join(safe_args)}"
     if DEBUG:
@@ -65,23 +200,249 @@ def run_shell_command(command, *args):
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Command failed: {e}")
 
-# Main workflow: Query DeepSeek multiple times, merge results, save markdown and PDF
+# Number of concurrent LLM requests, matching the server's OLLAMA_NUM_PARALLEL by default
+
+def default_parallelism(parallelism=None):
+    if parallelism is None:
+        parallelism = int(os.environ.get("OLLAMA_NUM_PARALLEL", "1"))
+    return max(1, parallelism)
+
+# Token-set (Jaccard) similarity between two LLM answers
+
+def token_set_similarity(text_a, text_b):
+    tokens_a = set(re.findall(r"\w+", text_a.lower()))
+    tokens_b = set(re.findall(r"\w+", text_b.lower()))
+    if not tokens_a and not tokens_b:
+        return 1.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+# Draw self-consistency samples concurrently, optionally stopping once they agree
+# Debug: Print each finished iteration and early-stop decisions
+
+def sample_deepseek(prompt_text, content_text, llm_model="deepseek-r1:70b", iteration_num=3, parallelism=None, early_stop_similarity=None, backend=None, options=None, checkpoint=None):
+    """Return the post-think answers of up to *iteration_num* samples, in iteration order.
+
+    *parallelism* defaults to ``OLLAMA_NUM_PARALLEL`` (or 1).  When
+    *early_stop_similarity* is set and two finished samples reach that token-set
+    similarity, the pending samples are cancelled and a single answer is returned.
+    """
+    parallelism = max(1, min(default_parallelism(parallelism), iteration_num))
+
+    def run_iteration(ver_idx):
+        if DEBUG:
+            print(f'[DEBUG] In prompt iteration {ver_idx} ...')
+        answer = query_deepseek(prompt_text, content_text, llm_model=llm_model, backend=backend, options=options, sample_idx=ver_idx, step=f"iteration:{ver_idx}", checkpoint=checkpoint)
+        return extract_post_think_text(answer)
 
-def ask_deepseek(prompt_text, content_text, markdown_filename, markdown_filename_pdf, llm_model="deepseek-r1:70b", llm_model_merge="deepseek-r1:70b", iteration_num=3):
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=parallelism)
+    try:
+        pending = {executor.submit(run_iteration, ver_idx): ver_idx for ver_idx in range(iteration_num)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+            if early_stop_similarity is None or not pending or len(results) < 2:
+                continue
+            answers = list(results.values())
+            if all(token_set_similarity(a, b) >= early_stop_similarity
+                   for i, a in enumerate(answers) for b in answers[i + 1:]):
+                if DEBUG:
+                    print(f"[DEBUG] {len(results)} samples agree, skipping {len(pending)} remaining")
+                first_idx = min(results)
+                return [results[first_idx]]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [results[ver_idx] for ver_idx in sorted(results)]
+
+# Tokens kept free in every call for the model's answer (including its reasoning)
+OUTPUT_TOKEN_RESERVE = 2048
+
+# Rough token count: ~4 characters per token for ASCII, one token per other character
+
+def estimate_tokens(text):
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+# Cut *text* down to at most *max_tokens* estimated tokens
+
+def truncate_to_tokens(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget, ascii_run = max_tokens - 1, 0
+    for end, ch in enumerate(text):
+        if ord(ch) < 128:
+            ascii_run += 1
+            cost = 1 if ascii_run % 4 == 0 else 0
+        else:
+            cost = 1
+        budget -= cost
+        if budget < 0:
+            return text[:end]
+    return text
+
+# Split *text* into pieces of at most *max_tokens*, on paragraph, then line, then word boundaries
+# Only a single word longer than the budget is cut; no text is dropped
+
+def split_to_tokens(text, max_tokens, separators=("\n\n", "\n", " ")):
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    if not separators:
+        pieces = []
+        while text:
+            head = truncate_to_tokens(text, max_tokens) or text[:1]
+            pieces.append(head)
+            text = text[len(head):]
+        return pieces
+    separator = separators[0]
+    pieces, current, current_tokens = [], [], 0
+    for part in text.split(separator):
+        for piece in split_to_tokens(part, max_tokens, separators[1:]):
+            piece_tokens = estimate_tokens(piece + separator)
+            if current and current_tokens + piece_tokens > max_tokens:
+                pieces.append(separator.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        pieces.append(separator.join(current))
+    return pieces
+
+# Split format_entries_text output into batches of at most *max_tokens*, on entry boundaries
+# Text without entry markers, or a single oversized entry, is split on paragraph boundaries
+
+def split_entries_text(content_text, max_tokens):
+    entries = re.split(r"\n\n(?=\[\d+\] Title: )", content_text)
+    batches, current, current_tokens = [], [], 0
+    for entry in entries:
+        for piece in split_to_tokens(entry, max_tokens):
+            piece_tokens = estimate_tokens(piece) + 1
+            if current and current_tokens + piece_tokens > max_tokens:
+                batches.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+# Content tokens left in a call with *prompt* once *output_tokens* are reserved for the answer
+
+def content_budget(prompt, context_tokens, output_tokens=OUTPUT_TOKEN_RESERVE):
+    max_tokens = context_tokens - output_tokens - estimate_tokens(prompt) - 16
+    if max_tokens <= 0:
+        raise ValueError(f"context_tokens={context_tokens} leaves no room for content")
+    return max_tokens
+
+# Merge summaries as a tree: each merge call gets as many summaries as fit in *context_tokens*
+# Debug: Print the group counts for every level
+
+def merge_tree(partials, context_tokens, llm_model_merge="deepseek-r1:70b", merge_prompt="Merge all result to one!", output_tokens=OUTPUT_TOKEN_RESERVE, parallelism=None, backend=None, options=None, checkpoint=None):
+    parallelism = default_parallelism(parallelism)
+    merge_budget = content_budget(merge_prompt, context_tokens, output_tokens)
+    level = 0
+    while len(partials) > 1:
+        level += 1
+        # Greedily group partial summaries (at least two per group) within the merge budget
+        groups, current, current_tokens = [], [], 0
+        for partial in partials:
+            partial_tokens = estimate_tokens(partial) + 4
+            if len(current) >= 2 and current_tokens + partial_tokens > merge_budget:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(partial)
+            current_tokens += partial_tokens
+        groups.append(current)
+
+        # Only groups of two or more need a merge call; even an overflowing pair is truncated to fit
+        merge_inputs = [truncate_to_tokens(''.join(f'results {idx}:' + part for idx, part in enumerate(group)), merge_budget)
+                        for group in groups if len(group) > 1]
+        if DEBUG:
+            print(f"[DEBUG] merge_tree: level {level}, {len(partials)} -> {len(groups)}")
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            answers = executor.map(lambda args: query_deepseek(merge_prompt, args[1], llm_model=llm_model_merge, backend=backend, options=options, step=f"merge:{level}:{args[0]}", checkpoint=checkpoint),
+                                   enumerate(merge_inputs))
+            merged = iter([extract_post_think_text(answer) for answer in answers])
+        partials = [next(merged) if len(group) > 1 else group[0] for group in groups]
+    return partials[0]
+
+# Map-reduce summarization: summarize token-budgeted batches in parallel, then merge them as a tree
+# Debug: Print batch counts for every level
+
+def summarize_chunked(prompt_text, content_text, context_tokens, llm_model="deepseek-r1:70b", llm_model_merge="deepseek-r1:70b", merge_prompt="Merge all result to one!", output_tokens=OUTPUT_TOKEN_RESERVE, parallelism=None, backend=None, options=None, checkpoint=None):
+    """Summarize *content_text* so that no prompt exceeds *context_tokens*.
+
+    *output_tokens* is reserved in every call for the model's answer (including its reasoning).
+    *content_text* may also be a list of chunks already within the content budget
+    (e.g. from :func:`iter_pdf_text_chunks`), which are used as the map batches.
+    """
+    parallelism = default_parallelism(parallelism)
+    if isinstance(content_text, list):
+        batches = content_text
+    else:
+        batches = split_entries_text(content_text, content_budget(prompt_text, context_tokens, output_tokens))
+    if DEBUG:
+        print(f"[DEBUG] summarize_chunked: {len(batches)} map batches")
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        answers = executor.map(lambda args: query_deepseek(prompt_text, args[1], llm_model=llm_model, backend=backend, options=options, step=f"map:{args[0]}", checkpoint=checkpoint),
+                               enumerate(batches))
+        partials = [extract_post_think_text(answer) for answer in answers]
+    return merge_tree(partials, context_tokens, llm_model_merge=llm_model_merge, merge_prompt=merge_prompt,
+                      output_tokens=output_tokens, parallelism=parallelism, backend=backend, options=options,
+                      checkpoint=checkpoint)
+
+# Write a summary Markdown file atomically: an existing summary file is always complete
+
+def write_summary(markdown_filename, text):
+    tmp_filename = f"{markdown_filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_filename, markdown_filename)
+    print(f"✅ Summary saved as Markdown: {markdown_filename}")
+
+# Main workflow: Query DeepSeek multiple times, merge results, save markdown and PDF; returns the summary text
+# With *markdown_filename* None nothing is written (e.g. the pipeline stores the summary in its archive first)
+# Every finished call is saved to *checkpoint* (checkpoints.Checkpoint), so a rerun after a crash only queries the missing ones
+# *content_text* may be a list of budgeted chunks (see summarize_chunked); several chunks need *context_tokens*
+
+def ask_deepseek(prompt_text, content_text, markdown_filename, markdown_filename_pdf, llm_model="deepseek-r1:70b", llm_model_merge="deepseek-r1:70b", iteration_num=3, backend=None, parallelism=None, early_stop_similarity=None, context_tokens=None, render_pdf=True, checkpoint=None):
+    if isinstance(content_text, list) and len(content_text) > 1 and not context_tokens:
+        raise ValueError("context_tokens is required for chunked input")
+    # A backend that cannot set num_ctx (`ollama run`) runs the model with its own, possibly smaller, context
+    backend_context = getattr(backend or LLM_BACKEND, "context_tokens", None)
+    if context_tokens and backend_context and backend_context < context_tokens:
+        context_tokens = backend_context
     if DEBUG:
         print(f"[DEBUG] ask_deepseek: markdown_filename={markdown_filename}, iteration_num={iteration_num}")
-    if not os.path.exists(markdown_filename):
-        all_text = ''
-        for ver_idx in range(iteration_num):
-            if DEBUG:
-                print(f'[DEBUG] In prompt iteration {ver_idx} ...')
-            answer = query_deepseek(prompt_text, content_text, llm_model=llm_model)
-            main_text = extract_post_think_text(answer)
-            all_text = all_text + f'results {ver_idx}:' + main_text
-        answer = query_deepseek('Merge all result to one!', all_text,  llm_model=llm_model_merge)
-        main_text = extract_post_think_text(answer)
-        final_text = main_text
-        with open(markdown_filename, "w", encoding="utf-8") as f:
-            f.write(final_text)
-        print(f"✅ Summary saved as Markdown: {markdown_filename}")
-    run_shell_command("md2pdf", markdown_filename, markdown_filename_pdf)
\ No newline at end of file
+    if markdown_filename and os.path.exists(markdown_filename):
+        with open(markdown_filename, "r", encoding="utf-8") as f:
+            final_text = f.read()
+    else:
+        options = {"num_ctx": context_tokens} if context_tokens else None
+        if isinstance(content_text, list) and len(content_text) <= 1:
+            content_text = ''.join(content_text)
+        if isinstance(content_text, list) or context_tokens and estimate_tokens(prompt_text) + estimate_tokens(content_text) + OUTPUT_TOKEN_RESERVE > context_tokens:
+            # Too large for one prompt (with room for the answer): map-reduce over entry batches
+            final_text = summarize_chunked(prompt_text, content_text, context_tokens, llm_model=llm_model,
+                                           llm_model_merge=llm_model_merge, parallelism=parallelism,
+                                           backend=backend, options=options, checkpoint=checkpoint)
+        else:
+            answers = sample_deepseek(prompt_text, content_text, llm_model=llm_model, iteration_num=iteration_num,
+                                      parallelism=parallelism, early_stop_similarity=early_stop_similarity,
+                                      backend=backend, options=options, checkpoint=checkpoint)
+            if len(answers) == 1:
+                # A single (or converged) sample needs no merge call
+                final_text = answers[0]
+            elif context_tokens and estimate_tokens(''.join(f'results {ver_idx}:' + main_text for ver_idx, main_text in enumerate(answers))) > content_budget('Merge all result to one!', context_tokens):
+                # The samples do not fit in one merge prompt: merge them in groups
+                final_text = merge_tree(answers, context_tokens, llm_model_merge=llm_model_merge, parallelism=parallelism,
+                                        backend=backend, options=options, checkpoint=checkpoint)
+            else:
+                all_text = ''.join(f'results {ver_idx}:' + main_text for ver_idx, main_text in enumerate(answers))
+                answer = query_deepseek('Merge all result to one!', all_text,  llm_model=llm_model_merge, backend=backend, options=options, step="merge", checkpoint=checkpoint)
+                final_text = extract_post_think_text(answer)
+        if markdown_filename:
+            write_summary(markdown_filename, final_text)
+    if render_pdf and markdown_filename:
+        render_batch([(markdown_filename, markdown_filename_pdf)])
+    return final_text
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""In-process batch Markdown -> PDF rendering.
+
+Replaces one ``md2pdf`` shell-out per file with an FPDF renderer that runs across
+a process pool.  Outputs whose Markdown source hash is unchanged since the last
+render are skipped; the hashes live in a ``.pdf_manifest.json`` next to the
+PDFs.  The external ``md2pdf`` command remains available as a backend, and is
+used for Markdown with CJK text when no CJK-capable TrueType font is installed.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+# Rendering backend: 'fpdf' (in-process) or 'md2pdf' (external command)
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "fpdf")
+
+# TrueType font used for non-Latin-1 text (e.g. Chinese); core Helvetica otherwise
+PDF_FONT_PATH = os.environ.get("PDF_FONT_PATH")
+# FPDF 1.7 only loads single .ttf files (no .ttc collections or CFF .otf fonts)
+CJK_FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "/usr/share/fonts/truetype/arphic-gkai00mp/gkai00mp.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Unicode.ttf",
+    "C:/Windows/Fonts/simhei.ttf",
+]
+FONT_CANDIDATES = ["/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"] + CJK_FONT_CANDIDATES
+CJK_RE = re.compile("[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+MANIFEST_NAME = ".pdf_manifest.json"
+# Batches run concurrently (e.g. the pipeline's pdf stage threads) share one feed directory
+_manifest_lock = threading.Lock()
+
+HEADING_SIZES = {1: 16, 2: 13, 3: 12}
+LINK_RE = re.compile(r"\[([^\]]*)\]\(([^)]*)\)")
+EMPHASIS_RE = re.compile(r"(\*\*|__|\*|`)")
+
+
+def _find_font(cjk: bool = False) -> Optional[str]:
+    """First installed font FPDF can load; with *cjk*, only fonts that have CJK glyphs."""
+    if PDF_FONT_PATH:
+        return PDF_FONT_PATH
+    for path in CJK_FONT_CANDIDATES if cjk else FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _inline(text: str) -> str:
+    """Flatten inline Markdown: links become ``text (url)``, emphasis markers are dropped."""
+    text = LINK_RE.sub(lambda m: f"{m.group(1)} ({m.group(2)})" if m.group(1) != m.group(2) else m.group(2), text)
+    return EMPHASIS_RE.sub("", text)
+
+
+def markdown_to_pdf(md_path: str, pdf_path: str, font_path: Optional[str] = None):
+    """Render the Markdown file *md_path* to *pdf_path* with FPDF."""
+    from fpdf import FPDF
+
+    with open(md_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    lines = text.splitlines()
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    font_path = font_path or _find_font(cjk=bool(CJK_RE.search(text)))
+    if font_path:
+        pdf.add_font("Body", "", font_path, uni=True)
+        family, encode = "Body", (lambda s: s)
+    else:
+        family, encode = "Helvetica", (lambda s: s.encode("latin-1", "replace").decode("latin-1"))
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            pdf.ln(3)
+            continue
+        heading = re.match(r"^(#{1,6})\s+(.*)$", stripped)
+        if heading:
+            level = len(heading.group(1))
+            pdf.set_font(family, "" if font_path else "B", HEADING_SIZES.get(level, 11))
+            pdf.multi_cell(0, 7, encode(_inline(heading.group(2))))
+            pdf.ln(1)
+            continue
+        bullet = re.match(r"^[-*+]\s+(.*)$", stripped)
+        if bullet:
+            stripped = "- " + bullet.group(1)
+        pdf.set_font(family, "", 10)
+        pdf.multi_cell(0, 5, encode(_inline(stripped)))
+
+    pdf.output(pdf_path, "F")
+
+
+def _render_one(job: Tuple[str, str, str, Optional[str]]) -> Dict:
+    md_path, pdf_path, backend, font_path = job
+    start = time.perf_counter()
+    try:
+        if backend == "md2pdf":
+            import subprocess
+            subprocess.run(["md2pdf", md_path, pdf_path], check=True)
+        else:
+            markdown_to_pdf(md_path, pdf_path, font_path)
+        status, error = "rendered", None
+    except Exception as e:
+        status, error = "failed", str(e)
+    return {"md": md_path, "pdf": pdf_path, "status": status, "error": error,
+            "seconds": time.perf_counter() - start}
+
+
+def _source_hash(source: bytes, backend: str) -> str:
+    digest = hashlib.sha256(backend.encode("utf-8"))
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def _job_backend(source: bytes, backend: str, font_path: Optional[str]) -> str:
+    """*backend*, or ``md2pdf`` when FPDF has no font for the CJK text in *source*."""
+    if (backend == "fpdf" and not font_path and not _find_font(cjk=True)
+            and CJK_RE.search(source.decode("utf-8", "replace"))):
+        return "md2pdf"
+    return backend
+
+
+def _load_manifest(directory: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_manifest(directory: str, updates: Dict[str, str]):
+    """Merge *updates* into the manifest on disk (re-read under the lock, so concurrent batches keep theirs)."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with _manifest_lock:
+        manifest = _load_manifest(directory)
+        manifest.update(updates)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def render_batch(jobs: Iterable[Tuple[str, str]],
+                 workers: Optional[int] = None,
+                 backend: Optional[str] = None,
+                 font_path: Optional[str] = None,
+                 force: bool = False) -> List[Dict]:
+    """Render ``(md_path, pdf_path)`` pairs and return per-file timing records.
+
+    Each record has ``md``, ``pdf``, ``status`` ('rendered', 'skipped' or
+    'failed'), ``error`` and ``seconds``.  PDFs whose Markdown source is
+    unchanged are skipped unless *force* is set.  More than one job is spread
+    over a process pool of *workers* processes (default: CPU count), but never
+    more processes than jobs.
+    """
+    backend = backend or PDF_BACKEND
+    results, pending, hashes, backends = [], [], {}, {}
+    manifests: Dict[str, Dict[str, str]] = {}
+
+    for md_path, pdf_path in jobs:
+        directory = os.path.dirname(os.path.abspath(pdf_path))
+        manifest = manifests.setdefault(directory, _load_manifest(directory))
+        with open(md_path, "rb") as f:
+            source = f.read()
+        job_backend = _job_backend(source, backend, font_path)
+        source_hash = _source_hash(source, job_backend)
+        hashes[pdf_path], backends[pdf_path] = source_hash, job_backend
+        if not force and os.path.exists(pdf_path) and manifest.get(os.path.basename(pdf_path)) == source_hash:
+            results.append({"md": md_path, "pdf": pdf_path, "status": "skipped", "error": None, "seconds": 0.0})
+            continue
+        pending.append((md_path, pdf_path, job_backend, font_path))
+
+    if len(pending) == 1:
+        rendered = [_render_one(pending[0])]
+    elif pending:
+        from concurrent.futures import ProcessPoolExecutor
+        # The pdf stage renders a couple of files per item from several threads: start only as many processes as jobs
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(pending))) as executor:
+            rendered = list(executor.map(_render_one, pending))
+    else:
+        rendered = []
+
+    updates: Dict[str, Dict[str, str]] = {}
+    for record in rendered:
+        if record["status"] == "rendered":
+            directory = os.path.dirname(os.path.abspath(record["pdf"]))
+            updates.setdefault(directory, {})[os.path.basename(record["pdf"])] = hashes[record["pdf"]]
+            print(f"✅ PDF saved: {record['pdf']} ({record['seconds']:.2f}s)")
+        else:
+            print(f"[ERROR] PDF rendering failed for {record['md']}: {record['error']}")
+    for directory, manifest_updates in updates.items():
+        _update_manifest(directory, manifest_updates)
+
+    if metrics.ENABLED:
+        for record in results + rendered:
+            metrics.record("pdf", pdf=record["pdf"], backend=backends[record["pdf"]], status=record["status"],
+                           seconds=record["seconds"])
+    return results + rendered
@@ -0,0 +1,235 @@
+"""Small staged pipeline engine used by the feeder jobs.
+
+Every stage has its own worker threads and a bounded input queue, so that
+network fetches, LLM calls and PDF rendering of different items overlap
+instead of running phase after phase.  After a run, :meth:`Pipeline.report`
+prints how busy each stage was.
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import metrics
+from paper_reader_kernel import write_summary
+from pdf_renderer import render_batch
+from seen_index import keyed_titles
+
+_DONE = object()
+
+
+def _item_label(item: Any) -> str:
+    """Name of an item in metrics: its category or URL for feed dicts."""
+    if isinstance(item, dict):
+        return str(item.get('category') or item.get('url') or '?')
+    return str(item)
+
+
+class Stage:
+    """One pipeline step: ``func(item)`` returns the item for the next stage, or None to drop it."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, queue_size: int = 4):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+
+class Pipeline:
+    """Run items through a chain of :class:`Stage` objects concurrently."""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.elapsed = 0.0
+        self._next_workers: Dict[int, int] = {}
+
+    def _worker(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue, finished: List[int]):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                print(f"[ERROR] Pipeline stage '{stage.name}' failed: {e}")
+                result = None
+                failed = 1
+            else:
+                failed = 0
+            elapsed = time.perf_counter() - start
+            if metrics.ENABLED:
+                metrics.record('stage', stage=stage.name, feed=_item_label(item), seconds=elapsed, ok=not failed)
+            with stage._lock:
+                stage.busy_seconds += elapsed
+                stage.processed += 1
+                stage.failed += failed
+            if result is not None:
+                outbox.put(result)
+
+        # The last worker of a stage to finish closes the next stage's queue
+        with stage._lock:
+            finished[0] += 1
+            last = finished[0] == stage.workers
+        if last:
+            next_workers = self._next_workers.get(id(outbox), 1)
+            for _ in range(next_workers):
+                outbox.put(_DONE)
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Feed *items* through all stages and return the outputs of the last stage."""
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results: queue.Queue = queue.Queue()
+        outboxes = queues[1:] + [results]
+        self._next_workers = {id(q): stage.workers for q, stage in zip(queues[1:], self.stages[1:])}
+
+        start = time.perf_counter()
+        threads = []
+        for stage, inbox, outbox in zip(self.stages, queues, outboxes):
+            stage.busy_seconds, stage.processed, stage.failed = 0.0, 0, 0
+            finished = [0]
+            for idx in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(stage, inbox, outbox, finished),
+                                          name=f"pipeline-{stage.name}-{idx}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start
+
+        outputs = []
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            outputs.append(item)
+        return outputs
+
+    def utilization(self) -> Dict[str, float]:
+        """Fraction of the run each stage's workers spent busy (0..1)."""
+        if not self.elapsed:
+            return {stage.name: 0.0 for stage in self.stages}
+        return {stage.name: stage.busy_seconds / (self.elapsed * stage.workers) for stage in self.stages}
+
+    def report(self):
+        print(f"Pipeline finished in {self.elapsed:.2f} seconds")
+        utilization = self.utilization()
+        for stage in self.stages:
+            print(f"  {stage.name:<10} workers={stage.workers} processed={stage.processed} "
+                  f"failed={stage.failed} busy={stage.busy_seconds:.2f}s utilization={utilization[stage.name]:.0%}")
+
+
+def make_feed_stages(fetcher: Any,
+                     summarize: Optional[Callable[[Dict], None]] = None,
+                     fetch_workers: int = 4,
+                     llm_workers: int = 1,
+                     pdf_workers: int = 2,
+                     retries: int = 2,
+                     backoff: float = 1.0,
+                     relevance: Optional[Any] = None,
+                     archive: Optional[Any] = None,
+                     checkpoints: Optional[Any] = None,
+                     seen_index: Optional[Any] = None) -> List[Stage]:
+    """Build the fetch -> parse -> markdown -> llm -> pdf stages for feed items.
+
+    Items are dicts with ``url``, ``source_type`` and ``raw_md`` keys, plus
+    ``summary_md``/``summary_pdf`` when *summarize* is given.  Stages add
+    ``feed_info`` (HTTP status, ``ttl``, ``skip_hours``/``skip_days`` for the
+    scheduler), ``config``, ``entries``, ``raw_text``, ``text``, ``pdf_jobs``
+    and ``pdf_timings``; *summarize(item)* is called in the llm stage and returns
+    the summary text, which the stage writes to ``item['summary_md']``
+    (its PDF is rendered in the pdf stage).  ``summarized`` is set once it is
+    written.
+    Items whose feed has no new entries skip the llm stage.
+
+    With a *relevance* filter (:class:`relevance.RelevanceFilter`, or an
+    item's own ``relevance`` key) ``text`` only holds the selected entries,
+    most relevant first, while the raw Markdown and ``raw_text`` keep them all.
+
+    With an *archive* (:class:`archive.Archive`) parsed entries and summaries
+    are stored in it, under the item's ``source_type`` and ``category``; a
+    summary is stored once per ``run`` key of the item, and its Markdown file
+    is generated from the archive.
+
+    With *checkpoints* (:class:`checkpoints.RunCheckpoints`) every item that
+    goes to the LLM is registered first and gets a ``checkpoint`` for
+    *summarize* to pass on to ``ask_deepseek``; it is marked finished once its
+    summary is written.  Unfinished items from
+    :meth:`checkpoints.CheckpointStore.pending` can be run through the last two
+    stages to resume an interrupted run.
+
+    With a :class:`seen_index.SeenIndex` (*seen_index*, or the fetcher's) the
+    parse stage adds the ``seen_keys`` of the item's new entries, and the llm
+    stage records them as seen once the summary is written, so entries of a
+    failed summary come back in the next run.  Runs without *summarize*
+    record nothing.
+    """
+    if seen_index is None:
+        seen_index = getattr(fetcher, 'seen_index', None)
+
+    def fetch(item):
+        item['feed'] = fetcher.with_retries(item['url'], lambda: fetcher.fetch_rss(item['url']), retries, backoff)
+        return item
+
+    def parse(item):
+        feed = item.pop('feed')
+        item['feed_info'] = fetcher.feed_info(feed)
+        item['config'] = fetcher.resolve_config(feed, item.get('source_type'))
+        item['entries'] = fetcher.parse_records(feed, item['config'])
+        if seen_index is not None:
+            item['seen_keys'] = keyed_titles(item['entries'])
+        if archive is not None:
+            archive.add_entries(item['entries'], item.get('source_type') or 'generic', item.get('category'))
+        return item
+
+    def markdown(item):
+        # Plain text for the LLM and the raw Markdown file come from one pass over the entries
+        item['raw_text'] = item['text'] = fetcher.render_entries(item['entries'], item['raw_md'],
+                                                                 item['config'].get('feed_name', 'RSS Feed'))
+        ranker = item.get('relevance', relevance)
+        if ranker is not None and item['entries']:
+            item['selected'], item['scores'] = ranker.select(item['entries'], _item_label(item))
+            item['text'] = fetcher.render_entries(item['selected'])
+        item['pdf_jobs'] = [(item['raw_md'], item['raw_md'].replace('.md', '.pdf'))]
+        if checkpoints is not None and summarize is not None and item['text']:
+            item['checkpoint'] = checkpoints.begin(item)
+        return item
+
+    def llm(item):
+        if summarize is not None and item['text']:
+            text = summarize(item)
+            if archive is not None:
+                # The archive is the primary record; the summary file is generated from it
+                summary_id = archive.add_summary(text, item.get('source_type') or 'generic', item.get('category'),
+                                                 item.get('run'))
+                text = archive.summary_text(summary_id)
+            write_summary(item['summary_md'], text)
+            item['summarized'] = True
+            item['pdf_jobs'].append((item['summary_md'], item['summary_pdf']))
+        if seen_index is not None and summarize is not None and item.get('seen_keys'):
+            seen_index.add(item['seen_keys'])
+        if checkpoints is not None and 'checkpoint' in item:
+            checkpoints.finish(item)
+        return item
+
+    def pdf(item):
+        item['pdf_timings'] = render_batch(item['pdf_jobs'])
+        return item
+
+    return [
+        Stage("fetch", fetch, workers=fetch_workers),
+        Stage("parse", parse),
+        Stage("markdown", markdown),
+        Stage("llm", llm, workers=llm_workers),
+        Stage("pdf", pdf, workers=pdf_workers),
+    ]
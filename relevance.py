@@ -0,0 +1,252 @@
+"""Rank feed entries against an interest profile before they reach the LLM.
+
+:class:`RelevanceFilter` scores the title and abstract of every entry with BM25
+(or cosine TF-IDF) against a profile of weighted terms and keeps the top-k
+and/or above-threshold entries.  Scoring is vectorized with NumPy over a sparse
+(document, term, count) representation of the whole batch.
+
+Document frequencies come from :class:`CorpusStats`, which grows its vocabulary
+with every batch and is saved to an ``.npz`` file, so IDF reflects all entries
+seen across runs rather than just today's feed.  Every entry is counted once,
+however often it is fetched or in how many feeds it appears.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+import metrics
+from seen_index import entry_key
+
+TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a about above after again against all also an and any are as at be been before being below between both but by
+can could did do does doing down during each few for from further had has have having here how i if in into is it
+its itself just more most no nor not of off on once only or other our out over own same she should so some such
+than that the their them then there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your via using based new show paper propose proposed
+approach results method methods study
+""".split())
+
+TEXT_FIELDS = ('title', 'summary', 'abstract', 'description')
+
+
+def document_key(entry, text: str) -> int:
+    """64-bit id of an entry: a hash of its identity (see :func:`seen_index.entry_key`), or of its text."""
+    key = entry_key(entry) or f"text:{text}"
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords, numbers and single characters."""
+    return [token for token in TOKEN_RE.findall(text.lower())
+            if len(token) > 1 and token not in STOPWORDS and not token.isdigit()]
+
+
+class CorpusStats:
+    """Incremental vocabulary and document frequencies, persisted as ``.npz``.
+
+    Args:
+        path: File the statistics are loaded from and saved to (None keeps them in memory).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.vocab: Dict[str, int] = {}
+        self.df = np.zeros(0, dtype=np.int64)
+        self.num_docs = 0
+        self.total_length = 0
+        # Ids (document_key) of the documents already counted
+        self.counted: Set[int] = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            terms = data['terms']
+            self.df = data['df'].astype(np.int64)
+            self.num_docs, self.total_length = (int(value) for value in data['counters'])
+            # Statistics saved before documents were counted once have no ids
+            self.counted = set(data['counted'].tolist()) if 'counted' in data.files else set()
+        self.vocab = {str(term): idx for idx, term in enumerate(terms)}
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            terms = np.array(sorted(self.vocab, key=self.vocab.get), dtype=str)
+            df = self.df[:len(terms)].copy()
+            counters = np.array([self.num_docs, self.total_length], dtype=np.int64)
+            counted = np.fromiter(self.counted, dtype=np.uint64, count=len(self.counted))
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, terms=terms, df=df, counters=counters, counted=counted)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / self.num_docs if self.num_docs else 1.0
+
+    def term_ids(self, tokens: Iterable[str], add: bool = False) -> np.ndarray:
+        """Vocabulary ids of *tokens*; unknown tokens are added when *add* is set, else dropped."""
+        vocab = self.vocab
+        if add:
+            ids = [vocab.setdefault(token, len(vocab)) for token in tokens]
+        else:
+            ids = [vocab[token] for token in tokens if token in vocab]
+        return np.fromiter(ids, dtype=np.int64, count=len(ids))
+
+    def update(self, documents: Sequence[List[str]], keys: Optional[Sequence[int]] = None) -> int:
+        """Count *documents* (token lists) into the statistics and return how many were counted.
+
+        With *keys* (one id per document), documents counted before are skipped.
+        """
+        with self._lock:
+            if keys is not None:
+                new_documents = []
+                for key, tokens in zip(keys, documents):
+                    if key not in self.counted:
+                        self.counted.add(key)
+                        new_documents.append(tokens)
+                documents = new_documents
+            term_ids = [self.term_ids(tokens, add=True) for tokens in documents]
+            if len(self.df) < len(self.vocab):
+                self.df = np.concatenate([self.df, np.zeros(len(self.vocab) - len(self.df), dtype=np.int64)])
+            lengths = np.fromiter((len(ids) for ids in term_ids), dtype=np.int64, count=len(term_ids))
+            doc_ids = np.repeat(np.arange(len(term_ids)), lengths)
+            flat = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+            # Each document counts once per distinct term
+            present = np.unique(doc_ids * len(self.vocab) + flat) % max(len(self.vocab), 1)
+            self.df += np.bincount(present, minlength=len(self.df))
+            self.num_docs += len(documents)
+            self.total_length += int(lengths.sum())
+        return len(documents)
+
+
+class RelevanceFilter:
+    """Select the entries of a feed that match an interest profile.
+
+    Args:
+        profile: Free text (every token weighs 1 per occurrence) or ``{term: weight}``.
+        stats: Shared :class:`CorpusStats`, or a path to load/save them from.
+        method: ``'bm25'`` or ``'tfidf'`` (cosine similarity of TF-IDF vectors).
+        top_k: Keep at most this many entries (None for no limit).
+        threshold: Keep only entries scoring at least this much (None keeps every entry
+            that matches at least one profile term, i.e. scores above zero).
+        fields: Entry fields whose text is scored.
+        k1, b: BM25 parameters.
+    """
+
+    def __init__(self,
+                 profile: Union[str, Dict[str, float]],
+                 stats: Union[CorpusStats, str, None] = None,
+                 method: str = 'bm25',
+                 top_k: Optional[int] = None,
+                 threshold: Optional[float] = None,
+                 fields: Sequence[str] = TEXT_FIELDS,
+                 k1: float = 1.5,
+                 b: float = 0.75):
+        if method not in ('bm25', 'tfidf'):
+            raise ValueError(f"Unknown relevance method: {method}")
+        if isinstance(profile, str):
+            weights: Dict[str, float] = {}
+            for token in tokenize(profile):
+                weights[token] = weights.get(token, 0.0) + 1.0
+        else:
+            weights = {}
+            for term, weight in profile.items():
+                for token in tokenize(term):
+                    weights[token] = weights.get(token, 0.0) + float(weight)
+        if not weights:
+            raise ValueError("Interest profile contains no usable terms")
+        self.profile = weights
+        self.stats = stats if isinstance(stats, CorpusStats) else CorpusStats(stats)
+        self.method = method
+        self.top_k = top_k
+        self.threshold = threshold
+        self.fields = tuple(fields)
+        self.k1 = k1
+        self.b = b
+
+    def entry_text(self, entry) -> str:
+        return " ".join(str(entry.get(field) or '') for field in self.fields)
+
+    def count(self, entries: Sequence) -> int:
+        """Add the entries not counted before to the corpus statistics; returns how many were new."""
+        texts = [self.entry_text(entry) for entry in entries]
+        return self.stats.update([tokenize(text) for text in texts],
+                                 [document_key(entry, text) for entry, text in zip(entries, texts)])
+
+    def score(self, entries: Sequence) -> np.ndarray:
+        """Score *entries* against the corpus statistics, without changing them."""
+        documents = [tokenize(self.entry_text(entry)) for entry in entries]
+        n = len(documents)
+        if not n:
+            return np.zeros(0)
+
+        stats = self.stats
+        with stats._lock:
+            # Terms the statistics have never counted cannot contribute to a score
+            term_ids = [stats.term_ids(tokens) for tokens in documents]
+            vocab_size = len(stats.vocab)
+            query = np.zeros(vocab_size)
+            for term, weight in self.profile.items():
+                if term in stats.vocab:
+                    query[stats.vocab[term]] = weight
+            df = stats.df[:vocab_size].astype(float)
+            num_docs, avg_length = stats.num_docs, stats.avg_length
+        doc_ids = np.repeat(np.arange(n), [len(ids) for ids in term_ids])
+        term_ids = np.concatenate(term_ids)
+        width = max(vocab_size, 1)
+
+        keys, counts = np.unique(doc_ids * width + term_ids, return_counts=True)
+        docs, terms = keys // width, keys % width
+        counts = counts.astype(float)
+
+        if self.method == 'bm25':
+            idf = np.log1p((num_docs - df[terms] + 0.5) / (df[terms] + 0.5))
+            lengths = np.array([len(tokens) for tokens in documents], dtype=float)
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avg_length)
+            contributions = query[terms] * idf * counts * (self.k1 + 1) / (counts + norm)
+            return np.bincount(docs, weights=contributions, minlength=n)
+
+        idf = np.log((1 + num_docs) / (1 + df)) + 1
+        weights = (1 + np.log(counts)) * idf[terms]
+        doc_norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=n))
+        query_norm = np.linalg.norm(query * idf)
+        dots = np.bincount(docs, weights=weights * query[terms] * idf[terms], minlength=n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(doc_norms > 0, dots / (doc_norms * (query_norm or 1.0)), 0.0)
+
+    def select(self, entries: Sequence, label: str = '') -> Tuple[List, np.ndarray]:
+        """Return ``(kept entries, most relevant first; scores of all entries)`` and save the statistics.
+
+        Entries not seen before are counted into the statistics first; entries
+        fetched again (e.g. after a run that did not summarize them) or listed
+        in several feeds are only scored.
+        """
+        start = time.perf_counter()
+        self.count(entries)
+        scores = self.score(entries)
+        order = np.argsort(-scores, kind='stable')
+        if self.threshold is None:
+            # Entries sharing no term with the profile score zero and are never relevant
+            order = order[scores[order] > 0]
+        else:
+            order = order[scores[order] >= self.threshold]
+        if self.top_k is not None:
+            order = order[:self.top_k]
+        kept = [entries[idx] for idx in order]
+        self.stats.save()
+        if metrics.ENABLED:
+            metrics.record('relevance', feed=label, total=len(entries), kept=len(kept),
+                           seconds=time.perf_counter() - start)
+        print(f"Relevance filter{f' ({label})' if label else ''}: kept {len(kept)}/{len(entries)} entries")
+        return kept, scores
@@ -0,0 +1,336 @@
+"""Event-driven job scheduler with adaptive per-feed polling.
+
+Replaces the ``while True: schedule.run_pending(); time.sleep(1)`` loops: the
+scheduler sleeps until the next task is due (or a running task finishes), so
+an idle feeder does not wake up every second.
+
+Two kinds of tasks can be registered:
+
+* :meth:`Scheduler.add_job` runs a function every *interval* seconds or daily
+  at ``"HH:MM"``.
+* :meth:`Scheduler.add_feeds` polls a group of feeds through one job function.
+  Every feed has its own interval: it shrinks towards the observed time between
+  updates while polls keep finding new entries and grows while they do not,
+  never below the feed's ``ttl`` or outside ``min_interval``/``max_interval``,
+  and polls are moved out of the feed's ``skipHours``/``skipDays``.  Feeds that
+  fall due within *coalesce* seconds of each other are polled in one call.
+
+Due times get random jitter, runs missed while the process was down are caught
+up once at startup (state is kept in *state_path*), at most *max_concurrent*
+jobs run at a time, and a task never overlaps with itself.
+"""
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+def feed_result(item: Dict) -> Dict:
+    """Poll result of a pipeline item for :meth:`Scheduler.add_feeds` jobs.
+
+    A feed counts as changed when it was not answered with ``304`` and parsing
+    left new entries (with a seen index only unseen entries are kept).
+    """
+    info = item.get('feed_info') or {}
+    return {
+        'changed': info.get('status') != 304 and bool(item.get('entries')),
+        'ttl': info.get('ttl'),
+        'skip_hours': info.get('skip_hours') or [],
+        'skip_days': info.get('skip_days') or [],
+    }
+
+
+def skip_forward(when: float, skip_hours: Iterable[int] = (), skip_days: Iterable[int] = ()) -> float:
+    """Move *when* to the start of the first hour outside *skip_hours*/*skip_days* (GMT, 0=Monday)."""
+    skip_hours, skip_days = set(skip_hours), set(skip_days)
+    if len(skip_hours) >= 24 or len(skip_days) >= 7:
+        return when
+    for _ in range(24 * 7):
+        moment = time.gmtime(when)
+        if moment.tm_hour not in skip_hours and moment.tm_wday not in skip_days:
+            break
+        when = when - when % 3600 + 3600
+    return when
+
+
+class FeedState:
+    """Polling state of one feed; times are Unix timestamps, intervals seconds."""
+
+    FIELDS = ('interval', 'next_poll', 'last_poll', 'last_change', 'change_interval',
+              'ttl', 'skip_hours', 'skip_days')
+
+    def __init__(self, interval: float, next_poll: float = 0.0):
+        self.interval = interval
+        self.next_poll = next_poll
+        self.last_poll: Optional[float] = None
+        self.last_change: Optional[float] = None
+        # Smoothed time between observed updates
+        self.change_interval: Optional[float] = None
+        self.ttl: Optional[int] = None
+        self.skip_hours: List[int] = []
+        self.skip_days: List[int] = []
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FeedState':
+        state = cls(data['interval'])
+        for name in cls.FIELDS:
+            if name in data:
+                setattr(state, name, data[name])
+        return state
+
+    def update(self, result: Optional[Dict], now: float, min_interval: float, max_interval: float,
+               smoothing: float = 0.3, poll_ratio: float = 0.5, backoff: float = 1.5):
+        """Adapt the interval to one poll's *result* (None when the poll failed)."""
+        self.last_poll = now
+        interval = self.interval
+        if result is not None:
+            self.ttl = result.get('ttl') or None
+            self.skip_hours = list(result.get('skip_hours') or [])
+            self.skip_days = list(result.get('skip_days') or [])
+            if result.get('changed'):
+                if self.last_change is not None:
+                    gap = now - self.last_change
+                    self.change_interval = gap if self.change_interval is None else (
+                        smoothing * gap + (1 - smoothing) * self.change_interval)
+                    # Poll a few times per observed update
+                    interval = self.change_interval * poll_ratio
+                self.last_change = now
+            else:
+                interval *= backoff
+        floor = max(min_interval, (self.ttl or 0) * 60)
+        self.interval = min(max(interval, floor), max(max_interval, floor))
+
+
+class _Task:
+    """A registered job; ``run(now)`` does one round and ``schedule(now)`` picks the next due time."""
+
+    def __init__(self, name: str, jitter: float, max_jitter: float):
+        self.name = name
+        self.jitter = jitter
+        self.max_jitter = max_jitter
+        self.due = 0.0
+
+    def jittered(self, when: float, interval: float) -> float:
+        return when + random.uniform(0, min(self.jitter * interval, self.max_jitter))
+
+
+class _FixedJob(_Task):
+    def __init__(self, name: str, func: Callable[[], Any], interval: Optional[float], at: Optional[str],
+                 jitter: float, max_jitter: float, last_run: Optional[float], catch_up: bool):
+        super().__init__(name, jitter, max_jitter)
+        if (interval is None) == (at is None):
+            raise ValueError(f"Job {name}: give exactly one of interval or at")
+        self.func = func
+        self.interval = interval if interval is not None else 86400.0
+        self.at = tuple(int(part) for part in at.split(':')) if at else None
+        self.last_run = last_run
+        now = time.time()
+        # A run missed while the process was down is due immediately (once)
+        if last_run is not None and catch_up and self.next_after(last_run) <= now:
+            self.due = now
+        else:
+            self.schedule(now)
+
+    def next_after(self, moment: float) -> float:
+        if self.at is None:
+            return moment + self.interval
+        hour, minute = self.at
+        start = datetime.fromtimestamp(moment)
+        candidate = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate <= start:
+            candidate += timedelta(days=1)
+        return candidate.timestamp()
+
+    def run(self, now: float):
+        self.last_run = now
+        self.func()
+
+    def schedule(self, now: float):
+        self.due = self.jittered(self.next_after(now), self.interval)
+
+    def state(self) -> Dict:
+        return {'last_run': self.last_run}
+
+
+class _FeedGroup(_Task):
+    def __init__(self, name: str, feeds: Iterable[str], func: Callable[[List[str]], Optional[Dict[str, Dict]]],
+                 initial_interval: float, min_interval: float, max_interval: float, coalesce: float,
+                 jitter: float, max_jitter: float, states: Dict[str, Dict], catch_up: bool):
+        super().__init__(name, jitter, max_jitter)
+        self.func = func
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.coalesce = coalesce
+        now = time.time()
+        self.feeds: Dict[str, FeedState] = {}
+        for feed in feeds:
+            if feed in states:
+                state = FeedState.from_dict(states[feed])
+                # Without catch-up a poll missed while the process was down waits a full interval
+                if not catch_up and state.next_poll < now:
+                    state.next_poll = now + state.interval
+            else:
+                state = FeedState(initial_interval, now)
+            self.feeds[feed] = state
+        self.schedule(now)
+
+    def run(self, now: float):
+        due = [feed for feed, state in self.feeds.items() if state.next_poll <= now + self.coalesce]
+        results: Dict[str, Dict] = {}
+        try:
+            results = self.func(due) or {}
+        finally:
+            finished = time.time()
+            for feed in due:
+                state = self.feeds[feed]
+                state.update(results.get(feed), finished, self.min_interval, self.max_interval)
+                state.next_poll = skip_forward(self.jittered(finished + state.interval, state.interval),
+                                               state.skip_hours, state.skip_days)
+        print(f"Next polls ({self.name}): " + ", ".join(
+            f"{feed} in {(state.next_poll - finished) / 3600:.1f}h" for feed, state in self.feeds.items()))
+
+    def schedule(self, now: float):
+        self.due = min((state.next_poll for state in self.feeds.values()), default=now + self.max_interval)
+
+    def state(self) -> Dict:
+        return {feed: state.to_dict() for feed, state in self.feeds.items()}
+
+
+class Scheduler:
+    """Run fixed and adaptive polling jobs in one process.
+
+    Args:
+        max_concurrent: Jobs that may run at the same time.
+        state_path: JSON file keeping last runs and feed intervals across restarts (None keeps nothing).
+        jitter: Random delay added to every due time, as a fraction of the interval...
+        max_jitter: ...but at most this many seconds.
+        catch_up: Run jobs whose due time passed while the process was down right away.
+    """
+
+    def __init__(self,
+                 max_concurrent: int = 1,
+                 state_path: Optional[str] = None,
+                 jitter: float = 0.05,
+                 max_jitter: float = 300.0,
+                 catch_up: bool = True):
+        self.max_concurrent = max(1, max_concurrent)
+        self.state_path = state_path
+        self.jitter = jitter
+        self.max_jitter = max_jitter
+        self.catch_up = catch_up
+        self._tasks: Dict[str, _Task] = {}
+        self._heap: List = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._state = self._load_state()
+
+    def _load_state(self) -> Dict:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {'jobs': {}, 'feeds': {}}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring unreadable scheduler state {self.state_path}: {e}")
+            return {'jobs': {}, 'feeds': {}}
+        state.setdefault('jobs', {})
+        state.setdefault('feeds', {})
+        return state
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with self._cond:
+            for name, task in self._tasks.items():
+                section = 'feeds' if isinstance(task, _FeedGroup) else 'jobs'
+                self._state[section][name] = task.state()
+            text = json.dumps(self._state, indent=1)
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, self.state_path)
+
+    def _add(self, task: _Task):
+        with self._cond:
+            if task.name in self._tasks:
+                raise ValueError(f"Duplicate scheduler job: {task.name}")
+            self._tasks[task.name] = task
+            heapq.heappush(self._heap, (task.due, next(self._counter), task))
+            self._cond.notify()
+
+    def add_job(self, name: str, func: Callable[[], Any], interval: Optional[float] = None,
+                at: Optional[str] = None):
+        """Run ``func()`` every *interval* seconds, or daily at *at* (``"HH:MM"``, local time)."""
+        last_run = self._state['jobs'].get(name, {}).get('last_run')
+        self._add(_FixedJob(name, func, interval, at, self.jitter, self.max_jitter, last_run, self.catch_up))
+
+    def add_feeds(self, name: str, feeds: Iterable[str], func: Callable[[List[str]], Optional[Dict[str, Dict]]],
+                  initial_interval: float = 3600.0, min_interval: float = 600.0,
+                  max_interval: float = 86400.0, coalesce: float = 600.0):
+        """Poll *feeds* adaptively with ``func(due_feeds)``.
+
+        *func* gets the names of the feeds that are due and returns
+        ``{feed: result}`` with :func:`feed_result`-style dicts (``changed``,
+        ``ttl``, ``skip_hours``, ``skip_days``); feeds without a result are
+        treated as failed polls and keep their interval.
+        """
+        states = self._state['feeds'].get(name, {})
+        self._add(_FeedGroup(name, feeds, func, initial_interval, min_interval, max_interval, coalesce,
+                             self.jitter, self.max_jitter, states, self.catch_up))
+
+    def _run_task(self, task: _Task):
+        try:
+            task.run(time.time())
+        except Exception as e:
+            print(f"[ERROR] Scheduled job '{task.name}' failed: {e}")
+        finally:
+            with self._cond:
+                task.schedule(time.time())
+                heapq.heappush(self._heap, (task.due, next(self._counter), task))
+                self._cond.notify()
+            self._save_state()
+
+    def next_runs(self) -> Dict[str, datetime]:
+        """When each registered job is due next."""
+        with self._cond:
+            return {name: datetime.fromtimestamp(task.due) for name, task in self._tasks.items()}
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def run(self, until: Optional[float] = None):
+        """Run due jobs until :meth:`stop` is called (or until the Unix time *until*)."""
+        self._stopped = False
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='scheduler')
+        try:
+            with self._cond:
+                while not self._stopped:
+                    now = time.time()
+                    if until is not None and now >= until:
+                        break
+                    if self._heap and self._heap[0][0] <= now:
+                        # A task is back on the heap only after its run finished, so it never overlaps itself
+                        _, _, task = heapq.heappop(self._heap)
+                        executor.submit(self._run_task, task)
+                        continue
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    if until is not None:
+                        timeout = min(timeout, until - now) if timeout is not None else until - now
+                    self._cond.wait(timeout)
+        finally:
+            executor.shutdown(wait=True)
@@ -0,0 +1,124 @@
+"""Persistent index of already-processed feed entries.
+
+Entries are identified by arXiv ID, DOI, PubMed ID or a normalized link (in that
+order), so that papers summarized in earlier runs, or cross-listed in several
+arXiv categories of the same run, reach the LLM only once.  Entries are only
+recorded (:meth:`SeenIndex.add`) once their summary is written.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+ARXIV_ID_RE = re.compile(r'arxiv\.org/(?:abs|pdf)/([a-z\-\.]+/\d{7}|\d{4}\.\d{4,5})(?:v\d+)?', re.IGNORECASE)
+DOI_RE = re.compile(r'\b(10\.\d{4,9}/[^\s"<>]+)', re.IGNORECASE)
+PUBMED_ID_RE = re.compile(r'pubmed\.ncbi\.nlm\.nih\.gov/(\d+)', re.IGNORECASE)
+
+
+def normalize_link(link: str) -> str:
+    """Lower-case scheme/host, drop tracking parameters, fragment and trailing slash."""
+    parts = urlparse(link.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith('utm_')]
+    return urlunparse((
+        'https' if parts.scheme in ('http', 'https') else parts.scheme,
+        parts.netloc.lower(),
+        parts.path.rstrip('/'),
+        '',
+        urlencode(sorted(query)),
+        '',
+    ))
+
+
+def entry_key(entry: Dict) -> Optional[str]:
+    """Return a stable identity for a parsed entry, or None if it has none."""
+    link = str(entry.get('link') or '')
+
+    match = ARXIV_ID_RE.search(link)
+    if match:
+        return f"arxiv:{match.group(1).lower()}"
+
+    for field in ('doi', 'link'):
+        match = DOI_RE.search(str(entry.get(field) or ''))
+        if match:
+            return f"doi:{match.group(1).lower().rstrip('.')}"
+
+    match = PUBMED_ID_RE.search(link)
+    if match:
+        return f"pmid:{match.group(1)}"
+
+    if link:
+        return f"link:{normalize_link(link)}"
+
+    title = ' '.join(str(entry.get('title') or '').lower().split())
+    return f"title:{title}" if title else None
+
+
+def keyed_titles(entries: Iterable[Dict]) -> List[Tuple[str, str]]:
+    """``(identity, title)`` of every entry that has an identity, for :meth:`SeenIndex.add`."""
+    pairs = []
+    for entry in entries:
+        key = entry_key(entry)
+        if key is not None:
+            pairs.append((key, str(entry.get('title') or '')))
+    return pairs
+
+
+class SeenIndex:
+    """SQLite-backed set of entry identities shared across runs and threads."""
+
+    def __init__(self, db_path: str = "./seen_entries.sqlite3"):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " key TEXT PRIMARY KEY,"
+            " title TEXT,"
+            " first_seen REAL)"
+        )
+        self._conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def filter_new(self, entries: List[Dict], run_keys: Optional[Set[str]] = None) -> List[Dict]:
+        """Drop entries already in the index; the index itself is not changed.
+
+        Duplicates inside *entries* are collapsed as well, and with a
+        *run_keys* set shared by the feeds of one run, so are entries already
+        kept for another feed; the kept keys are added to it.  Entries without
+        any identity are always kept.
+        """
+        new_entries = []
+        batch_keys = run_keys if run_keys is not None else set()
+        with self._lock:
+            for entry in entries:
+                key = entry_key(entry)
+                if key is None:
+                    new_entries.append(entry)
+                    continue
+                if key in batch_keys:
+                    continue
+                if self._conn.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() is None:
+                    batch_keys.add(key)
+                    new_entries.append(entry)
+        return new_entries
+
+    def add(self, keys: Iterable[Sequence[str]]):
+        """Record ``(identity, title)`` pairs (from :func:`keyed_titles`) as seen."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO seen (key, title, first_seen) VALUES (?, ?, ?)",
+                                   [(key, title, now) for key, title in keys])
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
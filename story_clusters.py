@@ -0,0 +1,305 @@
+"""Near-duplicate story clustering across news sources with MinHash and LSH.
+
+Each entry's normalized title and summary is split into byte 5-gram shingles;
+a MinHash signature over them estimates Jaccard similarity.  Signatures are cut
+into bands and hashed into buckets (LSH), so candidate pairs are found in
+roughly linear time; candidates are confirmed by their signature agreement and
+merged with union-find.
+
+:class:`StoryIndex` keeps the signatures of earlier runs in SQLite, so a story
+that was already summarized (possibly from another outlet or with a reworded
+headline) is recognized as a repeat.
+"""
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SHINGLE_BYTES = 5
+# Signature value of texts without shingles (never counted as similar)
+_EMPTY = np.uint32(0xFFFFFFFF)
+# Shingles processed per vectorized block (bounds the num_perm x block matrix)
+BLOCK_SHINGLES = 1 << 14
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case, replace punctuation with spaces and collapse whitespace."""
+    return ' '.join(NON_WORD_RE.sub(' ', text.lower()).split())
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Distinct byte 5-grams of *text* (already normalized), packed into integers."""
+    data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8).astype(np.uint64)
+    if len(data) < SHINGLE_BYTES:
+        return np.array([int.from_bytes(text.encode('utf-8'), 'big')] if text else [], dtype=np.uint64)
+    grams = np.zeros(len(data) - SHINGLE_BYTES + 1, dtype=np.uint64)
+    for offset in range(SHINGLE_BYTES):
+        grams = (grams << np.uint64(8)) | data[offset:len(data) - SHINGLE_BYTES + 1 + offset]
+    return np.unique(grams)
+
+
+def is_empty(signature: np.ndarray) -> bool:
+    """Whether *signature* belongs to a text without shingles."""
+    return bool((signature == _EMPTY).all())
+
+
+class Story:
+    """Entries from one or more sources that report the same story."""
+
+    __slots__ = ('entries', 'sources', 'signature', 'repeat', 'index_id')
+
+    def __init__(self, signature: np.ndarray):
+        # (source, entry) pairs in input order
+        self.entries: List[Tuple[str, object]] = []
+        self.sources: List[str] = []
+        self.signature = signature
+        # Matches a story indexed in an earlier run (with that story's index id)
+        self.repeat = False
+        self.index_id: Optional[int] = None
+
+    def add(self, source: str, entry):
+        self.entries.append((source, entry))
+        if source not in self.sources:
+            self.sources.append(source)
+
+    def to_entry(self) -> Dict:
+        """The representative entry as a dict, with the reporting sources attached."""
+        return dict(self.representative.items(), sources=', '.join(self.sources))
+
+    @property
+    def representative(self):
+        """The member entry with the most text."""
+        return max((entry for _, entry in self.entries),
+                   key=lambda entry: len(str(entry.get('summary') or '')) + len(str(entry.get('title') or '')))
+
+
+class StoryIndex:
+    """SQLite store of story signatures from earlier runs, with in-memory LSH buckets.
+
+    Stories not seen again for *max_age_days* are dropped when the index is saved.
+    """
+
+    def __init__(self, db_path: str = "./story_index.sqlite3", max_age_days: float = 7.0):
+        self.db_path = db_path
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stories ("
+            " id INTEGER PRIMARY KEY,"
+            " signature BLOB,"
+            " title TEXT,"
+            " sources TEXT,"
+            " first_seen REAL,"
+            " last_seen REAL)"
+        )
+        self._conn.commit()
+        self.signatures: Dict[int, np.ndarray] = {}
+        # ((bands, rows), {band key: [story ids]}) for the settings last matched against
+        self._bucket_cache: Optional[Tuple[Tuple[int, int], Dict[bytes, List[int]]]] = None
+        for story_id, blob in self._conn.execute("SELECT id, signature FROM stories"):
+            self.signatures[story_id] = np.frombuffer(blob, dtype=np.uint32)
+
+    def match(self, clusterer: 'StoryClusterer', signature: np.ndarray) -> Optional[int]:
+        """Id of an indexed story similar to *signature*, or None (always None for empty texts)."""
+        if is_empty(signature):
+            return None
+        for key in clusterer.band_keys(signature):
+            for story_id in self._buckets(clusterer).get(key, ()):
+                if clusterer.similarity(signature, self.signatures[story_id]) >= clusterer.threshold:
+                    return story_id
+        return None
+
+    def _buckets(self, clusterer: 'StoryClusterer') -> Dict[bytes, List[int]]:
+        buckets = self._bucket_cache
+        if buckets is None or buckets[0] != (clusterer.bands, clusterer.rows):
+            table: Dict[bytes, List[int]] = {}
+            for story_id, signature in self.signatures.items():
+                if len(signature) != clusterer.num_perm or is_empty(signature):
+                    continue  # indexed with other MinHash settings, or stored before empty texts were skipped
+                for key in clusterer.band_keys(signature):
+                    table.setdefault(key, []).append(story_id)
+            buckets = self._bucket_cache = ((clusterer.bands, clusterer.rows), table)
+        return buckets[1]
+
+    def update(self, stories: Iterable[Story]):
+        """Store new *stories*, refresh repeated ones and expire stale entries.
+
+        Stories without text are not stored, since they can never match.
+        """
+        now = time.time()
+        with self._lock:
+            for story in stories:
+                if story.index_id is not None:
+                    self._conn.execute("UPDATE stories SET last_seen = ? WHERE id = ?", (now, story.index_id))
+                    continue
+                if is_empty(story.signature):
+                    continue
+                title = str(story.representative.get('title') or '')
+                cursor = self._conn.execute(
+                    "INSERT INTO stories (signature, title, sources, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)",
+                    (story.signature.astype(np.uint32).tobytes(), title, ','.join(story.sources), now, now))
+                self.signatures[cursor.lastrowid] = story.signature.astype(np.uint32)
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT id FROM stories WHERE last_seen < ?", (now - self.max_age,))]
+            self._conn.executemany("DELETE FROM stories WHERE id = ?", [(story_id,) for story_id in expired])
+            self._conn.commit()
+            for story_id in expired:
+                self.signatures.pop(story_id, None)
+            self._bucket_cache = None
+
+
+class StoryClusterer:
+    """Group near-duplicate entries with MinHash signatures and LSH banding.
+
+    Args:
+        num_perm: Signature length (number of hash permutations).
+        bands: LSH bands; ``num_perm`` must be divisible by it.  With ``r = num_perm / bands``
+            rows per band, pairs above roughly ``(1 / bands) ** (1 / r)`` similarity become candidates.
+        threshold: Minimum estimated Jaccard similarity for two entries to be one story.
+        fields: Entry fields whose normalized text is compared.
+        index: Optional :class:`StoryIndex` of earlier runs.
+        seed: Seed of the hash permutations (must stay fixed for a persisted index).
+    """
+
+    def __init__(self,
+                 num_perm: int = 128,
+                 bands: int = 32,
+                 threshold: float = 0.5,
+                 fields: Sequence[str] = ('title', 'summary'),
+                 index: Optional[StoryIndex] = None,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm={num_perm} is not divisible by bands={bands}")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.fields = tuple(fields)
+        self.index = index
+        # Multiply-shift hash family: high 32 bits of (a * x + b) mod 2**64 with odd a
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1))[:, None]
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)[:, None]
+
+    def entry_text(self, entry) -> str:
+        return normalize_text(' '.join(str(entry.get(field) or '') for field in self.fields))
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """MinHash signatures (``len(texts) x num_perm``) of normalized *texts*.
+
+        Texts without shingles get an all-maximum signature, which matches nothing.
+        """
+        signatures = np.full((len(texts), self.num_perm), _EMPTY, dtype=np.uint32)
+        hashes = [shingle_hashes(text) for text in texts]
+        doc = 0
+        while doc < len(texts):
+            # Hash a block of whole documents at once, then take per-document minima
+            start, size = doc, 0
+            while doc < len(texts) and (size == 0 or size + len(hashes[doc]) <= BLOCK_SHINGLES):
+                size += len(hashes[doc])
+                doc += 1
+            block = hashes[start:doc]
+            lengths = np.array([len(h) for h in block])
+            if not lengths.sum():
+                continue
+            values = ((self._a * np.concatenate(block)[None, :] + self._b) >> np.uint64(32)).astype(np.uint32)
+            nonempty = np.flatnonzero(lengths)
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])[nonempty]
+            signatures[start + nonempty] = np.minimum.reduceat(values, offsets, axis=1).T
+        return signatures
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = self.rows
+        return [bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes() for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.mean(a == b))
+
+    def candidate_pairs(self, signatures: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """Unique ``(i, j)`` pairs (``i < j``) of valid rows sharing at least one LSH band."""
+        rows = np.flatnonzero(valid)
+        pairs = []
+        for band in range(self.bands):
+            block = np.ascontiguousarray(signatures[rows, band * self.rows:(band + 1) * self.rows])
+            keys = block.view(np.dtype((np.void, block.dtype.itemsize * self.rows))).ravel()
+            _, bucket, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            # Only buckets with two or more rows yield pairs; usually a small minority
+            shared = np.flatnonzero(counts[bucket] > 1)
+            order = shared[np.argsort(bucket[shared], kind='stable')]
+            bounds = np.flatnonzero(np.diff(bucket[order])) + 1
+            for members in np.split(rows[order], bounds):
+                first, second = np.triu_indices(len(members), 1)
+                pairs.append(np.stack([members[first], members[second]], axis=1))
+        if not pairs:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.unique(np.concatenate(pairs), axis=0)
+
+    def similar_pairs(self, signatures: np.ndarray, valid: np.ndarray, chunk: int = 1 << 14) -> np.ndarray:
+        """Candidate pairs whose estimated similarity reaches the threshold."""
+        candidates = self.candidate_pairs(signatures, valid)
+        confirmed = []
+        for start in range(0, len(candidates), chunk):
+            pairs = candidates[start:start + chunk]
+            agreement = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+            confirmed.append(pairs[agreement >= self.threshold])
+        return np.concatenate(confirmed) if confirmed else candidates
+
+    def cluster(self, entries_by_source: Dict[str, Sequence]) -> List[Story]:
+        """Group the entries of all sources into stories, in first-appearance order.
+
+        Stories matching the index are flagged with ``repeat``.  The index is
+        not changed; call :meth:`record` once the new stories are summarized.
+        """
+        members = [(source, entry) for source, entries in entries_by_source.items() for entry in entries]
+        signatures = self.signatures([self.entry_text(entry) for _, entry in members])
+        empty = (signatures == _EMPTY).all(axis=1)
+
+        parent = list(range(len(members)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in self.similar_pairs(signatures, ~empty):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        stories: Dict[int, Story] = {}
+        for i, (source, entry) in enumerate(members):
+            root = find(i)
+            if root not in stories:
+                stories[root] = Story(signatures[root])
+            stories[root].add(source, entry)
+        result = list(stories.values())
+
+        if self.index is not None:
+            for story in result:
+                story.index_id = self.index.match(self, story.signature)
+                story.repeat = story.index_id is not None
+        return result
+
+    def record(self, stories: Iterable[Story]):
+        """Add *stories* (from :meth:`cluster`) to the index, so later runs treat them as repeats."""
+        if self.index is not None:
+            self.index.update(stories)
+
+
+def stories_by_source(stories: Iterable[Story], include_repeats: bool = False) -> Dict[str, List[Story]]:
+    """Assign each story to the first source that reported it."""
+    owned: Dict[str, List[Story]] = {}
+    for story in stories:
+        if story.repeat and not include_repeats:
+            continue
+        owned.setdefault(story.sources[0], []).append(story)
+    return owned
@@ -0,0 +1,177 @@
+"""Incremental RSS/Atom parser for very large feeds.
+
+``feedparser.parse`` builds the whole feed before the first entry can be used.
+:class:`StreamingFeed` instead reads the document with ``iterparse`` and yields
+one ``FeedParserDict`` entry at a time, discarding each element once it has
+been converted, so memory stays bounded by a single entry.  The first few
+entries are buffered on demand (:meth:`StreamingFeed.peek`) so that source
+detection can run before the rest of the document is read.
+"""
+import re
+import xml.etree.ElementTree as ET
+from itertools import chain
+from typing import IO, Dict, Iterator, List, Optional
+
+import feedparser
+from feedparser.mixin import _FeedParserMixin
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+DC_NS = 'http://purl.org/dc/elements/1.1/'
+CONTENT_NS = 'http://purl.org/rss/1.0/modules/content/'
+
+AUTHOR_EMAIL_RE = re.compile(r'^(\S+@\S+)\s*\((.*)\)$')
+# Atom type attributes as the MIME types feedparser stores in ``<key>_detail``
+ATOM_TYPES = {'text': 'text/plain', 'html': 'text/html', 'xhtml': 'application/xhtml+xml'}
+ENTRY_TAGS = frozenset({'item', f'{{{ATOM_NS}}}entry', '{http://purl.org/rss/1.0/}item'})
+
+
+def _split(tag: str):
+    if tag.startswith('{'):
+        uri, _, local = tag[1:].partition('}')
+        return uri, local
+    return '', tag
+
+
+def _text(elem: ET.Element) -> str:
+    if len(elem):
+        # Inline (e.g. Atom xhtml) content: keep the markup for the HTML cleaner
+        return (elem.text or '') + ''.join(ET.tostring(child, encoding='unicode') for child in elem)
+    return (elem.text or '').strip()
+
+
+def _content_type(uri: str, local: str, elem: ET.Element, value: str) -> str:
+    """The content type feedparser reports for a title or summary element."""
+    if uri == ATOM_NS:
+        return ATOM_TYPES.get(elem.get('type', 'text'), elem.get('type'))
+    if local == 'title':
+        # RSS titles are plain text unless they look like escaped HTML
+        return 'text/html' if _FeedParserMixin.looks_like_html(value) else 'text/plain'
+    return 'text/html'
+
+
+def _entry_from_element(elem: ET.Element, prefixes: Dict[str, str]) -> feedparser.FeedParserDict:
+    """Convert one <item>/<entry> into the keys feedparser would produce for it."""
+    entry = feedparser.FeedParserDict()
+    authors: List[Dict[str, str]] = []
+    links: List[Dict[str, str]] = []
+
+    for child in elem:
+        uri, local = _split(child.tag)
+        if uri == DC_NS and local == 'creator':
+            authors.append(feedparser.FeedParserDict(name=_text(child)))
+        elif uri == DC_NS and local == 'date':
+            entry.setdefault('updated', _text(child))
+        elif uri == CONTENT_NS and local == 'encoded':
+            entry['content'] = [feedparser.FeedParserDict(type='text/html', value=_text(child))]
+        elif uri == ATOM_NS and local == 'link' or (uri == '' and local == 'link' and 'href' in child.attrib):
+            link = feedparser.FeedParserDict(rel=child.get('rel', 'alternate'), href=child.get('href', ''))
+            links.append(link)
+            if link['rel'] == 'alternate' and 'link' not in entry:
+                entry['link'] = link['href']
+        elif uri == ATOM_NS and local == 'author':
+            name = child.find(f'{{{ATOM_NS}}}name')
+            authors.append(feedparser.FeedParserDict(name=(name.text or '').strip() if name is not None else ''))
+        elif uri == ATOM_NS and local == 'content':
+            content_type = _content_type(uri, local, child, '')
+            entry['content'] = [feedparser.FeedParserDict(type=content_type, value=_text(child))]
+        elif uri in ('', ATOM_NS, 'http://purl.org/rss/1.0/'):
+            value = _text(child)
+            if local == 'link':
+                entry['link'] = value
+                links.append(feedparser.FeedParserDict(rel='alternate', href=value))
+            elif local in ('description', 'summary'):
+                entry['summary'] = value
+                entry['summary_detail'] = feedparser.FeedParserDict(
+                    type=_content_type(uri, local, child, value), value=value)
+            elif local == 'title':
+                entry['title'] = value
+                entry['title_detail'] = feedparser.FeedParserDict(
+                    type=_content_type(uri, local, child, value), value=value)
+            elif local == 'pubDate':
+                entry['published'] = value
+            elif local in ('guid', 'id'):
+                entry['id'] = value
+            elif local == 'author':
+                entry['author'] = value
+                # "email (Name)" -> Name, as feedparser does
+                match = AUTHOR_EMAIL_RE.match(value)
+                authors.append(feedparser.FeedParserDict(name=match.group(2) if match else value))
+            else:
+                entry[local] = value
+        else:
+            # Unknown namespaces follow feedparser's prefix_localname convention (e.g. dc_identifier)
+            prefix = prefixes.get(uri, '')
+            entry[f'{prefix}_{local}' if prefix else local] = _text(child)
+
+    if authors:
+        entry['authors'] = authors
+        entry.setdefault('author', authors[-1]['name'])
+    if links:
+        entry['links'] = links
+    if 'summary' not in entry and 'content' in entry:
+        entry['summary'] = entry['content'][0]['value']
+        entry['summary_detail'] = feedparser.FeedParserDict(entry['content'][0])
+    return entry
+
+
+def iter_entries(source: IO[bytes]) -> Iterator[feedparser.FeedParserDict]:
+    """Yield the entries of the RSS/Atom document read from *source*, one at a time."""
+    prefixes: Dict[str, str] = {}
+    stack: List[ET.Element] = []
+    for event, payload in ET.iterparse(source, events=('start-ns', 'start', 'end')):
+        if event == 'start-ns':
+            prefix, uri = payload
+            prefixes.setdefault(uri, prefix)
+        elif event == 'start':
+            stack.append(payload)
+        else:
+            elem = stack.pop()
+            if elem.tag in ENTRY_TAGS:
+                yield _entry_from_element(elem, prefixes)
+                # Drop the converted element so the tree never grows beyond one entry
+                if stack:
+                    stack[-1].remove(elem)
+                elem.clear()
+
+
+class StreamingFeed:
+    """Lazily parsed feed: iterate it for entries; :meth:`peek` buffers the first few."""
+
+    def __init__(self, source: IO[bytes], close_source: bool = True):
+        self._source = source
+        self._close_source = close_source
+        self._entries = iter_entries(source)
+        self._head: List[feedparser.FeedParserDict] = []
+        self._consumed = False
+
+    def peek(self, n: int = 1) -> List[feedparser.FeedParserDict]:
+        """Return up to the first *n* entries without consuming them."""
+        while len(self._head) < n:
+            entry = next(self._entries, None)
+            if entry is None:
+                break
+            self._head.append(entry)
+        return self._head[:n]
+
+    def __iter__(self) -> Iterator[feedparser.FeedParserDict]:
+        if self._consumed:
+            raise RuntimeError("StreamingFeed can only be iterated once")
+        self._consumed = True
+        try:
+            yield from chain(self._head, self._entries)
+        finally:
+            self._head = []
+            self.close()
+
+    def close(self):
+        if self._close_source and self._source is not None:
+            self._source.close()
+            self._source = None
+
+
+def first_entry(feed) -> Optional[feedparser.FeedParserDict]:
+    """First entry of a feedparser result or a :class:`StreamingFeed`, or None if empty."""
+    if isinstance(feed, StreamingFeed):
+        head = feed.peek(1)
+        return head[0] if head else None
+    return feed.entries[0] if feed.entries else None
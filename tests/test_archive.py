@@ -0,0 +1,54 @@
+"""Tests for summaries in archive.Archive: one per source, category and run, searchable after replacement."""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from archive import Archive
+
+
+class SummaryArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = os.path.join(directory.name, "archive.sqlite3")
+
+    def open(self):
+        archive = Archive(self.db_path)
+        self.addCleanup(archive.close)
+        return archive
+
+    def test_rerun_replaces_summary_of_the_run(self):
+        archive = self.open()
+        first = archive.add_summary("diffusion models summary", "arxiv", "cs.LG", "20250101_1000")
+        again = archive.add_summary("transformer models summary", "arxiv", "cs.LG", "20250101_1000")
+        other = archive.add_summary("diffusion models summary", "arxiv", "cs.LG", "20250101_1100")
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertEqual(archive.summary_text(first), "transformer models summary")
+        self.assertEqual(len(archive.search(kind="summaries")), 2)
+        # The full-text index follows the replaced text
+        self.assertEqual([row["id"] for row in archive.search("transformer", "summaries")], [first])
+        self.assertEqual([row["id"] for row in archive.search("diffusion", "summaries")], [other])
+
+    def test_summaries_without_run_are_appended(self):
+        archive = self.open()
+        archive.add_summary("a summary", "news", "bbc")
+        archive.add_summary("a summary", "news", "bbc")
+        self.assertEqual(len(archive.search(kind="summaries")), 2)
+
+    def test_opens_archive_without_run_column(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(
+            "CREATE TABLE summaries (id INTEGER PRIMARY KEY, source TEXT, category TEXT, text TEXT, archived TEXT);"
+            "INSERT INTO summaries (source, category, text, archived) VALUES ('arxiv', 'cs.AI', 'old', '2024-01-01');")
+        conn.close()
+        archive = self.open()
+        summary_id = archive.add_summary("new", "arxiv", "cs.AI", "20250101_1000")
+        self.assertEqual(archive.add_summary("newer", "arxiv", "cs.AI", "20250101_1000"), summary_id)
+        self.assertEqual([row["text"] for row in archive.search(kind="summaries")], ["newer", "old"])
+
+
+if __name__ == "__main__":
+    unittest.main()
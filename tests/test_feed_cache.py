@@ -0,0 +1,98 @@
+"""Tests for conditional GET with feed_cache.FeedCache against a local feed server."""
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import arxiv_feed
+from feed_cache import FeedCache
+from universal_rss_fetcher2 import UniversalRSSFetcher
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 05:00:00 GMT"
+
+
+class _ValidatingHandler(BaseHTTPRequestHandler):
+    """Serves ``server.body`` with ``ETag: server.etag``; answers 304 when the client's validators match."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers.items()))
+        if server.etag and self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(server.body)))
+        if server.etag:
+            self.send_header("ETag", server.etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(server.body)
+
+
+class ConditionalGetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ValidatingHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.serve(arxiv_feed(5), '"v1"')
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/rss/cs.AI"
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def serve(self, body, etag):
+        self.server.body, self.server.etag = body.encode("utf-8"), etag
+
+    def fetch(self):
+        # A new fetcher per poll, as in every feeder job; only the cache directory persists
+        fetcher = UniversalRSSFetcher(cache=FeedCache(self.cache_dir.name))
+        feed = fetcher.fetch_rss(self.url)
+        return feed, fetcher.parse_entries(feed, fetcher.source_configs["arxiv"])
+
+    def test_not_modified_reuses_cached_entries(self):
+        feed, entries = self.fetch()
+        self.assertEqual(feed["status"], 200)
+        self.assertNotIn("If-None-Match", self.server.requests[0])
+        self.assertNotIn("If-Modified-Since", self.server.requests[0])
+
+        cached_feed, cached_entries = self.fetch()
+        self.assertEqual(self.server.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual(self.server.requests[1]["If-Modified-Since"], LAST_MODIFIED)
+        self.assertEqual(cached_feed["status"], 304)
+        self.assertEqual(cached_feed["etag"], '"v1"')
+        self.assertEqual(len(cached_entries), 5)
+        self.assertEqual(cached_entries, entries)
+
+    def test_changed_feed_replaces_cache(self):
+        self.fetch()
+        self.serve(arxiv_feed(3, offset=100), '"v2"')
+        feed, entries = self.fetch()
+        self.assertEqual(feed["status"], 200)
+        self.assertEqual(len(entries), 3)
+
+        cached_feed, cached_entries = self.fetch()
+        self.assertEqual(self.server.requests[2]["If-None-Match"], '"v2"')
+        self.assertEqual(cached_feed["status"], 304)
+        self.assertEqual(cached_entries, entries)
+
+    def test_feed_without_validators_is_not_cached(self):
+        self.serve(arxiv_feed(2), None)
+        self.fetch()
+        feed, entries = self.fetch()
+        self.assertNotIn("If-None-Match", self.server.requests[1])
+        self.assertEqual(feed["status"], 200)
+        self.assertEqual(len(entries), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Fetch errors: fetch_rss raises for retries, the convenience wrappers log them and return no entries."""
+import contextlib
+import io
+import threading
+import unittest
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from universal_rss_fetcher2 import UniversalRSSFetcher, fetch_rss_universal
+
+
+class _NotFoundHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_error(404)
+
+
+class FetchErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _NotFoundHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f"http://127.0.0.1:{server.server_port}/rss/missing"
+
+    def test_fetch_rss_raises(self):
+        with self.assertRaises(urllib.error.HTTPError) as caught:
+            UniversalRSSFetcher().fetch_rss(self.url)
+        self.assertEqual(caught.exception.code, 404)
+
+    def test_wrappers_return_empty_result(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(fetch_rss_universal(self.url, 'arxiv'), '')
+            self.assertEqual(UniversalRSSFetcher().fetch_universal_rss(self.url), '')
+        self.assertEqual(output.getvalue().count("[ERROR] Fetch failed"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
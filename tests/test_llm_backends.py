@@ -0,0 +1,143 @@
+"""Tests for llm_backends against local stand-in Ollama servers (no model needed)."""
+import contextlib
+import io
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fakes import FakeOllama
+from llm_backends import OllamaHTTPBackend, SubprocessOllamaBackend
+
+# Stand-in `ollama` executable: `ollama run <model>` answers with the model and the prompt
+OLLAMA_STUB = """#!{python}
+import sys
+sys.stdout.write("stub " + sys.argv[2] + ": " + sys.stdin.read())
+"""
+
+
+class _ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers every request with the server's ``status`` and NDJSON ``lines``."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in self.server.lines)
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def scripted_server(status, lines):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ScriptedHandler)
+    server.daemon_threads = True
+    server.status, server.lines = status, lines
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def ollama_stub(directory):
+    stub = os.path.join(directory, "ollama")
+    with open(stub, "w", encoding="utf-8") as f:
+        f.write(OLLAMA_STUB.format(python=sys.executable))
+    os.chmod(stub, os.stat(stub).st_mode | stat.S_IXUSR)
+    return stub
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class OllamaHTTPBackendTest(unittest.TestCase):
+
+    def test_streams_tokens(self):
+        with FakeOllama(output_tokens=5) as ollama:
+            tokens = []
+            output = OllamaHTTPBackend(ollama.base_url).generate("prompt", "model", on_token=tokens.append)
+        expected = list(ollama.tokens_for("prompt"))
+        self.assertEqual(tokens, expected)
+        self.assertEqual(output, "".join(expected).strip())
+
+    def test_reuses_connection(self):
+        with FakeOllama(output_tokens=3) as ollama:
+            backend = OllamaHTTPBackend(ollama.base_url)
+            outputs = [backend.generate(f"prompt {i}", "model") for i in range(5)]
+        self.assertEqual(ollama.requests, 5)
+        self.assertEqual(ollama.connections, 1)
+        self.assertTrue(all(outputs))
+
+    def test_http_error_status(self):
+        server = scripted_server(500, [{"error": "model not found"}])
+        try:
+            backend = OllamaHTTPBackend(f"http://127.0.0.1:{server.server_port}")
+            with self.assertRaisesRegex(RuntimeError, "HTTP 500"):
+                backend.generate("prompt", "model")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_error_line_in_stream(self):
+        server = scripted_server(200, [{"response": "partial", "done": False}, {"error": "out of memory"}])
+        try:
+            backend = OllamaHTTPBackend(f"http://127.0.0.1:{server.server_port}")
+            tokens = []
+            with self.assertRaisesRegex(RuntimeError, "out of memory"):
+                backend.generate("prompt", "model", on_token=tokens.append)
+            self.assertEqual(tokens, ["partial"])
+            # The failed connection is not returned to the pool
+            self.assertTrue(backend._pool.empty())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_falls_back_when_connection_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = OllamaHTTPBackend(f"http://127.0.0.1:{free_port()}",
+                                        fallback=SubprocessOllamaBackend(executable=ollama_stub(directory)))
+            tokens = []
+            output = backend.generate("hello", "model-a", on_token=tokens.append)
+        self.assertEqual(output, "stub model-a: hello")
+        self.assertEqual(tokens, ["stub model-a: hello"])
+
+    def test_connection_refused_without_fallback(self):
+        backend = OllamaHTTPBackend(f"http://127.0.0.1:{free_port()}")
+        with self.assertRaises(ConnectionError):
+            backend.generate("prompt", "model")
+
+
+
+class SubprocessOllamaBackendTest(unittest.TestCase):
+
+    def test_warns_once_that_options_are_not_applied(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = SubprocessOllamaBackend(executable=ollama_stub(directory), context_tokens=4096)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                answers = [backend.generate("hello", "model-a", options={"num_ctx": 32768}) for _ in range(2)]
+        self.assertEqual(answers, ["stub model-a: hello"] * 2)
+        self.assertEqual(output.getvalue().count("[WARN]"), 1)
+        self.assertIn("4096", output.getvalue())
+
+    def test_context_length_from_environment(self):
+        environ = dict(os.environ, OLLAMA_CONTEXT_LENGTH="8192")
+        with unittest.mock.patch.dict(os.environ, environ, clear=True):
+            self.assertEqual(SubprocessOllamaBackend().context_tokens, 8192)
+        self.assertIsNone(OllamaHTTPBackend().context_tokens)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Tests for chunked input to paper_reader_kernel.ask_deepseek against the fake Ollama server."""
+import os
+import tempfile
+import unittest
+
+import paper_reader_kernel
+from benchmarks.fakes import FakeOllama
+from llm_backends import LLMBackend, OllamaHTTPBackend
+
+PROMPT = "Summarize."
+
+
+class _RecordingBackend(LLMBackend):
+    """Answers every prompt at once and keeps the prompts; runs the model with *context_tokens*."""
+
+    def __init__(self, context_tokens):
+        self.context_tokens = context_tokens
+        self.prompts = []
+
+    def generate(self, prompt, model, options=None, on_token=None):
+        self.prompts.append(prompt)
+        return f"summary {len(self.prompts)}"
+
+
+class ChunkedInputTest(unittest.TestCase):
+
+    def setUp(self):
+        saved = paper_reader_kernel.LLM_CACHE
+        paper_reader_kernel.set_llm_cache(None)
+        self.addCleanup(paper_reader_kernel.set_llm_cache, saved)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.summary = os.path.join(directory.name, "summary.md")
+
+    def ask(self, content, backend=None, **kwargs):
+        paper_reader_kernel.ask_deepseek(PROMPT, content, self.summary, self.summary.replace(".md", ".pdf"),
+                                         backend=backend, render_pdf=False, **kwargs)
+
+    def test_chunks_require_context_tokens(self):
+        with self.assertRaisesRegex(ValueError, "context_tokens is required"):
+            self.ask(["first chunk", "second chunk"])
+        self.assertFalse(os.path.exists(self.summary))
+
+    def test_chunks_are_map_batches(self):
+        with FakeOllama(output_tokens=5) as ollama:
+            self.ask(["first chunk", "second chunk", "third chunk"], OllamaHTTPBackend(ollama.base_url),
+                     context_tokens=4096)
+        # One map call per chunk and one merge call
+        self.assertEqual(ollama.requests, 4)
+        self.assertTrue(os.path.exists(self.summary))
+
+    def test_single_chunk_needs_no_context_tokens(self):
+        with FakeOllama(output_tokens=5) as ollama:
+            self.ask(["only chunk"], OllamaHTTPBackend(ollama.base_url), iteration_num=1)
+        self.assertEqual(ollama.requests, 1)
+        with open(self.summary, encoding="utf-8") as f:
+            self.assertTrue(f.read())
+
+
+    def test_budgets_for_a_smaller_backend_context(self):
+        backend = _RecordingBackend(context_tokens=4096)
+        content = "\n\n".join(f"[{i}] Title: Paper {i}\nSummary: " + "word " * 200 for i in range(60))
+        self.ask(content, backend, context_tokens=32768)
+        self.assertGreater(len(backend.prompts), 2)
+        limit = 4096 - paper_reader_kernel.OUTPUT_TOKEN_RESERVE
+        self.assertTrue(all(paper_reader_kernel.estimate_tokens(prompt) <= limit for prompt in backend.prompts))
+
+
+if __name__ == "__main__":
+    unittest.main()
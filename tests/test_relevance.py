@@ -0,0 +1,53 @@
+"""Tests for relevance.RelevanceFilter: scoring leaves the corpus statistics alone, entries are counted once."""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from relevance import CorpusStats, RelevanceFilter
+
+
+def paper(number, title):
+    return {'title': title, 'summary': f'{title} abstract', 'link': f'http://arxiv.org/abs/2501.{number:05d}v1'}
+
+
+ENTRIES = [
+    paper(1, 'Graph diffusion models for molecules'),
+    paper(2, 'Protein folding with transformers'),
+    paper(3, 'Diffusion on graphs at scale'),
+]
+
+
+class CorpusStatsTest(unittest.TestCase):
+
+    def test_score_does_not_change_statistics(self):
+        ranker = RelevanceFilter('graph diffusion')
+        ranker.count(ENTRIES)
+        vocab, df, num_docs = dict(ranker.stats.vocab), ranker.stats.df.copy(), ranker.stats.num_docs
+        ranker.score(ENTRIES + [paper(4, 'Unseen words only')])
+        self.assertEqual(ranker.stats.vocab, vocab)
+        np.testing.assert_array_equal(ranker.stats.df, df)
+        self.assertEqual(ranker.stats.num_docs, num_docs)
+
+    def test_entries_are_counted_once(self):
+        ranker = RelevanceFilter('graph diffusion')
+        ranker.select(ENTRIES, 'cs.LG')
+        scores = ranker.score(ENTRIES)
+        # The same entries again (a later run) and in another feed (a cross-listing)
+        ranker.select(ENTRIES, 'cs.LG')
+        ranker.select(ENTRIES[:1], 'cs.AI')
+        self.assertEqual(ranker.stats.num_docs, len(ENTRIES))
+        np.testing.assert_allclose(ranker.score(ENTRIES), scores)
+
+    def test_counted_entries_persist(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stats.npz')
+            RelevanceFilter('graph diffusion', path).select(ENTRIES)
+            ranker = RelevanceFilter('graph diffusion', path)
+            self.assertEqual(ranker.count(ENTRIES + [paper(4, 'Graph neural networks')]), 1)
+            self.assertEqual(CorpusStats(path).num_docs, len(ENTRIES))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""The streaming parser must produce the same records as feedparser for every source."""
+import unittest
+
+from benchmarks.fixtures import FEEDS
+from universal_rss_fetcher2 import UniversalRSSFetcher
+
+# Titles feedparser decodes to plain text, and a title that is escaped HTML
+EDGE_CASES = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel><title>t</title>
+<item><title>Regret bounds when $n&lt;k$ and $k&gt;2$ arms</title>
+<link>https://arxiv.org/abs/2401.00001</link><dc:creator>A. Author, B. Author</dc:creator>
+<description>&lt;p&gt;Bounds for &lt;i&gt;k&lt;/i&gt; &amp;amp; n.&lt;/p&gt;</description></item>
+<item><title>A &lt;i&gt;novel&lt;/i&gt; method &amp;amp; more</title>
+<link>https://arxiv.org/abs/2401.00002</link><dc:creator>C. Author</dc:creator>
+<description>Plain abstract.</description></item>
+</channel></rss>"""
+
+# Entries per source in the large fixtures (several MB of XML each)
+LARGE_FEED_SIZE = 3000
+
+
+def parse(xml, source_type, stream):
+    fetcher = UniversalRSSFetcher(stream=stream)
+    feed = fetcher.fetch_rss(xml)
+    return fetcher.parse_entries(feed, fetcher.resolve_config(feed, source_type))
+
+
+class StreamParityTest(unittest.TestCase):
+
+    def test_fixture_sources(self):
+        for source, generate in FEEDS.items():
+            with self.subTest(source=source):
+                xml = generate(50)
+                expected = parse(xml, source, stream=False)
+                self.assertEqual(len(expected), 50)
+                self.assertEqual(parse(xml, source, stream=True), expected)
+
+    def test_large_fixture_sources(self):
+        for source, generate in FEEDS.items():
+            with self.subTest(source=source):
+                xml = generate(LARGE_FEED_SIZE)
+                expected = parse(xml, source, stream=False)
+                self.assertEqual(len(expected), LARGE_FEED_SIZE)
+                streamed = parse(xml, source, stream=True)
+                self.assertEqual(len(streamed), LARGE_FEED_SIZE)
+                self.assertEqual(streamed, expected)
+
+    def test_title_content_types(self):
+        expected = parse(EDGE_CASES, 'arxiv', stream=False)
+        self.assertEqual(expected[0]['title'], 'Regret bounds when $n<k$ and $k>2$ arms')
+        self.assertEqual(expected[1]['title'], 'A novel method & more')
+        self.assertEqual(parse(EDGE_CASES, 'arxiv', stream=True), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
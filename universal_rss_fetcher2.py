@@ -1,14 +1,179 @@
 import feedparser
 import datetime
-from bs4 import BeautifulSoup
-from paper_reader_kernel import run_shell_command
-from typing import Dict, List, Optional, Callable, Any
+import http.client
+import io
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+from html_cleaner import clean_html
+from feed_cache import FeedCache
+from seen_index import SeenIndex
+from stream_parser import StreamingFeed, first_entry
+from typing import Dict, List, Optional, Callable, Any, Iterator, Set, Tuple
+
+
+# FeedParserDict 对这些键做别名映射或特殊处理，不能直接按字典键读取
+_ALIASED_KEYS = frozenset(feedparser.FeedParserDict.keymap) | {
+    'category', 'enclosures', 'license', 'updated', 'updated_parsed'}
+_MISSING = object()
+# 不做HTML清洗的字段（链接和标识符可能含有 & 查询参数）
+RAW_FIELDS = frozenset({'link', 'url', 'doi', 'id', 'guid'})
+# feedparser在 <字段>_detail 中记录内容类型；只有这些类型需要HTML清洗，纯文本已被解码
+_HTML_TYPES = frozenset({'text/html', 'application/xhtml+xml'})
+# feedparser只保留skipHours/skipDays的最后一个值，需从原始XML中读取
+_SKIP_HOURS_RE = re.compile(rb'<skipHours[^>]*>(.*?)</skipHours>', re.S | re.I)
+_SKIP_DAYS_RE = re.compile(rb'<skipDays[^>]*>(.*?)</skipDays>', re.S | re.I)
+_HOUR_RE = re.compile(rb'<hour[^>]*>\s*(\d+)\s*</hour>', re.I)
+_DAY_RE = re.compile(rb'<day[^>]*>\s*(\w+)\s*</day>', re.I)
+_WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def _skip_schedule(data: bytes) -> Tuple[List[int], List[int]]:
+    """从RSS原始数据中提取skipHours（0-23，GMT）和skipDays（0=周一）"""
+    hours: List[int] = []
+    days: List[int] = []
+    match = _SKIP_HOURS_RE.search(data)
+    if match:
+        hours = sorted({int(hour) % 24 for hour in _HOUR_RE.findall(match.group(1))})
+    match = _SKIP_DAYS_RE.search(data)
+    if match:
+        names = {day.decode('ascii', 'ignore').lower() for day in _DAY_RE.findall(match.group(1))}
+        days = [idx for idx, name in enumerate(_WEEKDAYS) if name in names]
+    return hours, days
+
+
+def _empty_feed(error: Exception) -> feedparser.FeedParserDict:
+    """抓取失败时返回的空feed，与 feedparser.parse(url) 出错时的结果相同（bozo，无条目）"""
+    feed = feedparser.FeedParserDict(feed=feedparser.FeedParserDict(), entries=[], bozo=1, bozo_exception=error)
+    if isinstance(error, urllib.error.HTTPError):
+        feed['status'] = error.code
+    return feed
+
+
+def _attr_extractor(name: str) -> Callable[[Any], Any]:
+    """返回与 getattr(entry, name, '') 等价的提取函数，普通键直接走字典查找"""
+    if name in _ALIASED_KEYS or hasattr(dict, name):
+        return lambda entry: getattr(entry, name, '')
+    
+    dict_get = dict.get
+    
+    def extract(entry: Any) -> Any:
+        if isinstance(entry, dict):
+            value = dict_get(entry, name, _MISSING)
+            if value is not _MISSING:
+                return value
+        return getattr(entry, name, '')
+    return extract
+
+
+def _is_html(entry: Any, name: str) -> bool:
+    """字段 name 的内容类型是否为HTML（feedparser的 <name>_detail.type）"""
+    key = f'{name}_detail'
+    detail = entry.get(key) if isinstance(entry, dict) else getattr(entry, key, None)
+    return bool(detail) and detail.get('type') in _HTML_TYPES
+
+
+def _html_extractor(name: str, extract: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """包装提取函数：仅当字段内容为HTML时才清洗，避免再次解码纯文本（如 $n<k$）"""
+    def extract_clean(entry: Any) -> Any:
+        value = extract(entry)
+        return clean_html(value) if value and _is_html(entry, name) else value
+    return extract_clean
+
+
+class ExtractorPlan:
+    """由源配置编译而成的字段提取计划，每个配置只编译一次"""
+    
+    __slots__ = ('fields', 'extractors', 'labels', 'index')
+    
+    def __init__(self, config: Dict):
+        fields, extractors = [], []
+        # 共享的HTML清洗阶段，可通过 'clean_html': False 关闭
+        clean = config.get('clean_html', True)
+        for field_name, field_source in config.get('fields', {}).items():
+            fields.append(field_name)
+            if callable(field_source):
+                # 如果是函数，调用函数提取（函数自行负责清洗，输出不再处理）
+                extractor = field_source
+            elif isinstance(field_source, str):
+                # 如果是字符串，直接获取属性
+                extractor = _attr_extractor(field_source)
+                if clean and field_name not in RAW_FIELDS:
+                    extractor = _html_extractor(field_source, extractor)
+            else:
+                extractor = lambda entry: ''
+            extractors.append(extractor)
+        self.fields = tuple(fields)
+        self.extractors = tuple(extractors)
+        # 预先计算输出用的字段标签
+        self.labels = tuple(name.title() for name in fields)
+        self.index = {name: i for i, name in enumerate(fields)}
+    
+    def extract(self, entry: Any) -> 'EntryRecord':
+        return EntryRecord(self, tuple(extractor(entry) for extractor in self.extractors))
+
+
+class EntryRecord:
+    """紧凑的条目记录：字段名由计划共享，只保存值元组；提供只读字典接口"""
+    
+    __slots__ = ('plan', 'values')
+    
+    def __init__(self, plan: ExtractorPlan, values: Tuple):
+        self.plan = plan
+        self.values = values
+    
+    def __getitem__(self, key: str) -> Any:
+        return self.values[self.plan.index[key]]
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self.plan.index.get(key)
+        return default if i is None else self.values[i]
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.plan.index
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.plan.fields)
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def keys(self) -> Tuple[str, ...]:
+        return self.plan.fields
+    
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self.plan.fields, self.values)
+    
+    def to_dict(self) -> Dict:
+        """兼容视图：转换为普通字典"""
+        return dict(zip(self.plan.fields, self.values))
 
 
 class UniversalRSSFetcher:
     """通用RSS抓取器，支持自适应不同RSS源的结构"""
     
-    def __init__(self):
+    def __init__(self,
+                 timeout: float = 30.0,
+                 host_timeouts: Optional[Dict[str, float]] = None,
+                 cache: Optional[FeedCache] = None,
+                 seen_index: Optional[SeenIndex] = None,
+                 stream: bool = False):
+        # 网络超时（秒），可按主机单独设置
+        self.timeout = timeout
+        self.host_timeouts = dict(host_timeouts or {})
+        # 条件GET缓存（ETag / Last-Modified），为None时不缓存
+        self.cache = cache
+        # 跨运行的已处理条目索引，为None时不去重；这里只读取，条目在摘要写出后才记入索引
+        self.seen_index = seen_index
+        # 本次运行已保留的条目标识，用于去除不同feed间的交叉重复（每次运行新建抓取器）
+        self._run_keys: Set[str] = set()
+        # 流式解析大型feed（逐条产出，内存有界；不使用条件GET缓存）
+        self.stream = stream
+        # 已编译的提取计划: id(config) -> (config, plan)
+        self._plans: Dict[int, Tuple[Dict, ExtractorPlan]] = {}
         # 预定义的RSS源配置
         self.source_configs = {
             'pubmed': {
@@ -62,48 +227,119 @@ class UniversalRSSFetcher:
     
     def _extract_wiley_abstract(self, entry) -> str:
         """提取Wiley摘要信息"""
-        content_html = entry.get('content', [{}])[0].get('value', '')
-        if content_html:
-            soup = BeautifulSoup(content_html, 'html.parser')
-            ps = soup.find_all('p')
-            if ps:
-                return "\n\n".join(p.get_text(strip=True) for p in ps).strip()
-            return soup.get_text(strip=True)
-        return getattr(entry, 'summary', '')
+        content = entry.get('content', [{}])[0]
+        if content.get('value'):
+            return clean_html(content['value']) if content.get('type') in _HTML_TYPES else content['value']
+        summary = getattr(entry, 'summary', '')
+        return clean_html(summary) if _is_html(entry, 'summary') else summary
+    
+    def get_timeout(self, url: str) -> float:
+        """返回URL所在主机的超时时间"""
+        return self.host_timeouts.get(urlparse(url).hostname or '', self.timeout)
+    
+    def fetch_rss_stream(self, url: str) -> StreamingFeed:
+        """以流式方式打开RSS feed，条目在迭代时才被解析"""
+        if urlparse(url).scheme in ('http', 'https'):
+            request = urllib.request.Request(url, headers={'User-Agent': feedparser.USER_AGENT})
+            return StreamingFeed(urllib.request.urlopen(request, timeout=self.get_timeout(url)))
+        if os.path.exists(url):
+            return StreamingFeed(open(url, 'rb'))
+        # 原始XML字符串
+        return StreamingFeed(io.BytesIO(url.encode('utf-8')))
     
     def fetch_rss(self, url: str) -> Any:
-        """获取RSS feed"""
-        return feedparser.parse(url)
+        """获取RSS feed
+        
+        网络和HTTP错误（超时、404等）会抛出异常，以便 with_retries 重试；
+        fetch_universal_rss 及便捷函数则记录错误并返回空feed。
+        """
+        if self.stream:
+            return self.fetch_rss_stream(url)
+        if urlparse(url).scheme not in ('http', 'https'):
+            # 本地文件或原始XML字符串交给feedparser处理
+            return feedparser.parse(url)
+        
+        headers = {'User-Agent': feedparser.USER_AGENT}
+        cached = self.cache.get(url) if self.cache else None
+        if cached:
+            # 与feedparser的etag/modified参数相同的条件请求头
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('modified'):
+                headers['If-Modified-Since'] = cached['modified']
+        
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.get_timeout(url)) as response:
+                data = response.read()
+                response_headers = dict(response.headers.items())
+                status = response.status
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached:
+                # 未修改：直接复用缓存条目，无需下载和解析
+                feed = cached['feed']
+                feed['status'] = 304
+                feed['etag'] = cached.get('etag')
+                feed['modified'] = cached.get('modified')
+                return feed
+            raise
+        
+        feed = feedparser.parse(data, response_headers=response_headers)
+        # 存入频道信息，随缓存一起保存，304时仍可用
+        feed.feed['skip_hours'], feed.feed['skip_days'] = _skip_schedule(data)
+        feed['status'] = status
+        feed['etag'] = response.headers.get('ETag')
+        feed['modified'] = response.headers.get('Last-Modified')
+        if self.cache:
+            self.cache.put(url, feed, etag=feed['etag'], modified=feed['modified'])
+        return feed
     
-    def parse_entries(self, feed: Any, config: Dict) -> List[Dict]:
-        """根据配置解析RSS条目"""
-        entries = []
-        fields_config = config.get('fields', {})
+    def feed_info(self, feed: Any) -> Dict[str, Any]:
+        """返回轮询调度所需的频道信息：HTTP状态、ttl（分钟）、skipHours和skipDays"""
+        if isinstance(feed, StreamingFeed):
+            return {'status': None, 'ttl': None, 'skip_hours': [], 'skip_days': []}
+        channel = feed.get('feed', {})
+        try:
+            ttl = int(channel.get('ttl')) if channel.get('ttl') else None
+        except (TypeError, ValueError):
+            ttl = None
+        return {
+            'status': feed.get('status'),
+            'ttl': ttl,
+            'skip_hours': list(channel.get('skip_hours') or []),
+            'skip_days': list(channel.get('skip_days') or []),
+        }
+    
+    def compile_config(self, config: Dict) -> ExtractorPlan:
+        """将源配置编译为提取计划（按配置对象缓存）"""
+        cached = self._plans.get(id(config))
+        if cached is None or cached[0] is not config:
+            cached = (config, ExtractorPlan(config))
+            self._plans[id(config)] = cached
+        return cached[1]
+    
+    def parse_records(self, feed: Any, config: Dict) -> List[EntryRecord]:
+        """根据配置将RSS条目解析为紧凑记录"""
+        extract = self.compile_config(config).extract
+        entries = feed if isinstance(feed, StreamingFeed) else feed.entries
+        records = [extract(entry) for entry in entries]
         
-        for entry in feed.entries:
-            parsed_entry = {}
-            
-            for field_name, field_source in fields_config.items():
-                if callable(field_source):
-                    # 如果是函数，调用函数提取
-                    parsed_entry[field_name] = field_source(entry)
-                elif isinstance(field_source, str):
-                    # 如果是字符串，直接获取属性
-                    parsed_entry[field_name] = getattr(entry, field_source, '')
-                else:
-                    parsed_entry[field_name] = ''
-            
-            entries.append(parsed_entry)
+        # 去除以往运行中已处理的条目及本次的交叉重复条目
+        if self.seen_index is not None:
+            records = self.seen_index.filter_new(records, self._run_keys)
         
-        return entries
+        return records
+    
+    def parse_entries(self, feed: Any, config: Dict) -> List[Dict]:
+        """根据配置解析RSS条目（字典形式的兼容接口）"""
+        return [record.to_dict() for record in self.parse_records(feed, config)]
     
     def auto_detect_source(self, feed: Any) -> str:
-        """自动检测RSS源类型"""
-        if not feed.entries:
+        """自动检测RSS源类型（流式feed只读取第一条）"""
+        entry = first_entry(feed)
+        if entry is None:
             return 'generic'
         
-        entry = feed.entries[0]
-        
         # 检测arXiv
         if hasattr(entry, 'authors') or 'arxiv.org' in getattr(entry, 'link', ''):
             return 'arxiv'
@@ -120,10 +356,9 @@ class UniversalRSSFetcher:
     
     def get_generic_config(self, feed: Any) -> Dict:
         """为未知RSS源生成通用配置"""
-        if not feed.entries:
+        entry = first_entry(feed)
+        if entry is None:
             return {'fields': {}, 'feed_name': 'Generic RSS'}
-        
-        entry = feed.entries[0]
         fields = {}
         
         # 尝试常见字段
@@ -137,39 +372,77 @@ class UniversalRSSFetcher:
             'feed_name': 'Generic RSS'
         }
     
+    def _entry_fields(self, entry: Any) -> List[Tuple[str, Any]]:
+        """返回 (标签, 值) 对，跳过标题和空值"""
+        if isinstance(entry, EntryRecord):
+            return [(label, value) for name, label, value in zip(entry.plan.fields, entry.plan.labels, entry.values)
+                    if value and name != 'title']
+        return [(key.title(), value) for key, value in entry.items() if key != 'title' and value]
+    
     def format_entries_text(self, entries: List[Dict]) -> str:
         """将条目格式化为纯文本"""
-        formatted = []
-        for i, entry in enumerate(entries):
-            text_parts = [f"[{i}] Title: {entry.get('title', 'N/A')}"]
-            
-            # 动态添加其他字段
-            for key, value in entry.items():
-                if key != 'title' and value:
-                    text_parts.append(f"{key.title()}: {value}")
-            
-            formatted.append("\n".join(text_parts))
-        
-        return "\n\n".join(formatted)
+        return self.render_entries(entries)
     
     def save_markdown(self, entries: List[Dict], file_path: str, feed_name: str = "RSS Feed"):
         """保存为Markdown格式"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(f"# {feed_name} ({len(entries)} entries)\n\n")
-            f.write(f"Date: {datetime.date.today()}\n\n")
-            
-            for entry in entries:
-                f.write(f"## {entry.get('title', 'No Title')}\n")
-                
+        self.render_entries(entries, file_path, feed_name, with_text=False)
+    
+    def render_entries(self,
+                       entries: List[Dict],
+                       md_file: Optional[str] = None,
+                       feed_name: str = "RSS Feed",
+                       with_text: bool = True) -> str:
+        """一次遍历同时生成纯文本和Markdown文件
+        
+        Args:
+            entries: 条目（EntryRecord 或字典）
+            md_file: Markdown输出文件路径，为None时只生成文本
+            feed_name: Markdown标题中的源名称
+            with_text: 是否生成并返回纯文本
+        
+        Returns:
+            格式化的文本字符串（with_text为False时为空字符串）
+        """
+        formatted = []
+        markdown = []
+        if md_file:
+            markdown.append(f"# {feed_name} ({len(entries)} entries)\n\n")
+            markdown.append(f"Date: {datetime.date.today()}\n\n")
+        
+        for i, entry in enumerate(entries):
+            fields = self._entry_fields(entry)
+            if with_text:
+                # 动态添加其他字段
+                formatted.append("\n".join([f"[{i}] Title: {entry.get('title', 'N/A')}"] +
+                                           [f"{label}: {value}" for label, value in fields]))
+            if md_file:
+                markdown.append(f"## {entry.get('title', 'No Title')}\n")
                 # 动态写入其他字段
-                for key, value in entry.items():
-                    if key != 'title' and value:
-                        f.write(f"**{key.title()}:** {value}\n\n")
-                
+                markdown.extend([f"**{label}:** {value}\n\n" for label, value in fields])
                 if 'link' in entry:
-                    f.write(f"[View Article]({entry['link']})\n\n")
+                    markdown.append(f"[View Article]({entry['link']})\n\n")
+        
+        if md_file:
+            with open(md_file, 'w', encoding='utf-8') as f:
+                f.write("".join(markdown))
+            print(f"✅ Markdown saved: {md_file}")
+        return "\n\n".join(formatted)
+    
+    def resolve_config(self,
+                       feed: Any,
+                       source_type: Optional[str] = None,
+                       custom_config: Optional[Dict] = None) -> Dict:
+        """确定解析配置：自定义配置 > 指定源类型 > 自动检测"""
+        if custom_config:
+            return custom_config
+        if source_type and source_type in self.source_configs:
+            return self.source_configs[source_type]
         
-        print(f"✅ Markdown saved: {file_path}")
+        # 自动检测
+        detected_type = self.auto_detect_source(feed)
+        if detected_type in self.source_configs:
+            return self.source_configs[detected_type]
+        return self.get_generic_config(feed)
     
     def fetch_universal_rss(self, 
                            url: str, 
@@ -187,36 +460,42 @@ class UniversalRSSFetcher:
         Returns:
             格式化的文本字符串
         """
-        # 获取RSS feed
-        feed = self.fetch_rss(url)
+        # 获取RSS feed；与原先的 feedparser.parse(url) 相同，抓取失败时只记录错误并返回空feed
+        try:
+            feed = self.fetch_rss(url)
+        except (OSError, http.client.HTTPException) as e:
+            print(f"[ERROR] Fetch failed for {url}: {e}")
+            feed = _empty_feed(e)
         
         # 确定配置
-        if custom_config:
-            config = custom_config
-        elif source_type and source_type in self.source_configs:
-            config = self.source_configs[source_type]
-        else:
-            # 自动检测
-            detected_type = self.auto_detect_source(feed)
-            if detected_type in self.source_configs:
-                config = self.source_configs[detected_type]
-            else:
-                config = self.get_generic_config(feed)
+        config = self.resolve_config(feed, source_type, custom_config)
         
         # 解析条目
-        entries = self.parse_entries(feed, config)
+        entries = self.parse_records(feed, config)
+        
+        # 一次遍历生成格式化文本并保存Markdown文件
+        text = self.render_entries(entries, md_file, config.get('feed_name', 'RSS Feed'))
         
-        # 保存Markdown文件
         if md_file:
-            feed_name = config.get('feed_name', 'RSS Feed')
-            self.save_markdown(entries, md_file, feed_name)
-            
             # 生成PDF
             pdf_file = md_file.replace('.md', '.pdf')
-            run_shell_command("md2pdf", md_file, pdf_file)
+            from pdf_renderer import render_batch
+            render_batch([(md_file, pdf_file)])
         
         # 返回格式化文本
-        return self.format_entries_text(entries)
+        return text
+    
+    def with_retries(self, url: str, func: Callable[[], Any], retries: int = 2, backoff: float = 1.0) -> Any:
+        """调用 func()，失败时按指数退避重试"""
+        for attempt in range(retries + 1):
+            try:
+                return func()
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = backoff * 2 ** attempt
+                print(f"[WARN] Fetch failed for {url} ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
     
     def add_custom_source(self, name: str, config: Dict):
         """添加自定义RSS源配置"""